@@ -19,10 +19,32 @@ ALLOWED_DEVICE_IDS = {3001, 3002, 3003}
 # size in bytes
 HEADER_SIZE = 13  # version(1) + msg_type(1) + flags(1) + device_id(2) + seq_num(4) + timestamp(4)
 READING_SIZE = 5
+QUANT_READING_SIZE = 2  # sensor_type(1) + quantized uint8 value(1)
 PAYLOAD_LIMIT = 200
 
 # flags
 FLAG_BATCHING = 0x01  # bit 0: batching enabled
+FLAG_QUANT_U8 = 0x02  # bit 1: readings carry uint8-quantized values
+
+# Per-sensor value ranges for uint8 quantization; each sensor's physical
+# range maps onto 0..255 (e.g. ~0.04 degC resolution for temperature)
+QUANT_RANGES = {
+    SENSOR_TEMP: (20.0, 30.0),
+    SENSOR_HUM: (30.0, 90.0),
+    SENSOR_VOLT: (3.0, 5.5),
+}
+
+
+def quantize_value(sensor_type: int, value: float) -> int:
+    # map value onto 0..255 within the sensor's range, clamping outliers
+    lo, hi = QUANT_RANGES[sensor_type]
+    q = round((value - lo) * 255.0 / (hi - lo))
+    return 0 if q < 0 else 255 if q > 255 else q
+
+
+def dequantize_value(sensor_type: int, q: int) -> float:
+    lo, hi = QUANT_RANGES[sensor_type]
+    return lo + q * (hi - lo) / 255.0
 
 
 class SensorReading:
@@ -54,6 +76,32 @@ def encode_reading(sensor_type: int, value: float) -> bytes:
     return struct.pack('!Bf', sensor_type, value)
 
 
+def encode_packet_into(buf, packet: TelemetryPacket) -> int:
+    """Encode a packet into a caller-supplied buffer, return bytes written.
+
+    Allocation-free variant of encode_packet for hot send paths: the caller
+    reuses one bytearray of at least PAYLOAD_LIMIT bytes across calls.
+    Validation stays in encode_packet; this assumes client-built packets
+    with trusted fields."""
+    struct.pack_into('!BBBHII', buf, 0, packet.version, packet.msg_type,
+                     packet.flags, packet.device_id, packet.seq_num, packet.timestamp)
+    if packet.msg_type in (MSG_INIT, MSG_HEARTBEAT):
+        return HEADER_SIZE
+
+    struct.pack_into('!B', buf, HEADER_SIZE, len(packet.readings))
+    offset = HEADER_SIZE + 1
+    if packet.flags & FLAG_QUANT_U8:
+        for reading in packet.readings:
+            struct.pack_into('!BB', buf, offset, reading.sensor_type,
+                             quantize_value(reading.sensor_type, reading.value))
+            offset += QUANT_READING_SIZE
+    else:
+        for reading in packet.readings:
+            struct.pack_into('!Bf', buf, offset, reading.sensor_type, reading.value)
+            offset += READING_SIZE
+    return offset
+
+
 def encode_packet(packet: TelemetryPacket) -> bytes:
     """ turn complete packet into bytes and save it in data
     packet = header (13 bytes) + reading count (1 byte) * readings (5 bytes)"""
@@ -89,8 +137,10 @@ def encode_packet(packet: TelemetryPacket) -> bytes:
         if reading_count == 0:
             raise ValueError("DATA packet must contain at least one reading")
 
-        # check total size
-        total_size = HEADER_SIZE + 1 + reading_count * READING_SIZE
+        # check total size (quantized readings are 2 bytes instead of 5)
+        quantized = bool(packet.flags & FLAG_QUANT_U8)
+        reading_size = QUANT_READING_SIZE if quantized else READING_SIZE
+        total_size = HEADER_SIZE + 1 + reading_count * reading_size
         if total_size > PAYLOAD_LIMIT:
             raise ValueError(f"Packet exceeds payload limit: {total_size} > {PAYLOAD_LIMIT}")
 
@@ -106,8 +156,13 @@ def encode_packet(packet: TelemetryPacket) -> bytes:
 
         data += struct.pack('!B', reading_count)  # count how many readings 1 byte
 
-        for reading in packet.readings:
-            data += encode_reading(reading.sensor_type, reading.value)
+        if quantized:
+            for reading in packet.readings:
+                data += struct.pack('!BB', reading.sensor_type,
+                                    quantize_value(reading.sensor_type, reading.value))
+        else:
+            for reading in packet.readings:
+                data += encode_reading(reading.sensor_type, reading.value)
 
         return data
 
@@ -174,7 +229,9 @@ def decode_packet(data: bytes) -> TelemetryPacket:
         if reading_count <= 0:
             raise ValueError("DATA packet must contain at least 1 reading")
 
-        expected_size = 1 + reading_count * READING_SIZE
+        quantized = bool(flags & FLAG_QUANT_U8)
+        reading_size = QUANT_READING_SIZE if quantized else READING_SIZE
+        expected_size = 1 + reading_count * reading_size
 
         # leftover / truncated
         if payload_len < expected_size:
@@ -186,28 +243,46 @@ def decode_packet(data: bytes) -> TelemetryPacket:
         # Step 4: Decode each reading
         offset = 1
 
+        # Last value seen per sensor type, filled in the same pass that
+        # builds the readings so consumers avoid re-walking the list
+        temp = humid = volt = None
+
         for i in range(reading_count):
             # offset safety check
-            if offset + READING_SIZE > payload_len:
+            if offset + reading_size > payload_len:
                 raise ValueError(f"Truncated reading block at index {i}")
 
-            sensor_type, value = decode_reading(payload[offset:offset + READING_SIZE])
+            if quantized:
+                sensor_type = payload[offset]
+                if sensor_type not in (SENSOR_TEMP, SENSOR_HUM, SENSOR_VOLT):
+                    raise ValueError(f"Invalid sensor_type in reading {i}: {sensor_type}")
+                value = dequantize_value(sensor_type, payload[offset + 1])
+            else:
+                sensor_type, value = decode_reading(payload[offset:offset + READING_SIZE])
 
-            if sensor_type not in (SENSOR_TEMP, SENSOR_HUM, SENSOR_VOLT):
-                raise ValueError(f"Invalid sensor_type in reading {i}: {sensor_type}")
+                if sensor_type not in (SENSOR_TEMP, SENSOR_HUM, SENSOR_VOLT):
+                    raise ValueError(f"Invalid sensor_type in reading {i}: {sensor_type}")
 
-            if not math.isfinite(value):
-                raise ValueError(f"Invalid reading value in reading {i}: {value}")
+                if not math.isfinite(value):
+                    raise ValueError(f"Invalid reading value in reading {i}: {value}")
 
             readings.append(SensorReading(sensor_type, value))
-            offset += READING_SIZE
+            if sensor_type == SENSOR_TEMP:
+                temp = value
+            elif sensor_type == SENSOR_HUM:
+                humid = value
+            else:
+                volt = value
+            offset += reading_size
 
         # final leftover check
         if offset != payload_len:
             raise ValueError(f"Unused bytes after readings: {payload_len - offset} bytes remaining")
 
         # Step 5: Return the TelemetryPacket with flags
-        return TelemetryPacket(version, msg_type, device_id, seq_num, timestamp, readings, flags)
+        packet = TelemetryPacket(version, msg_type, device_id, seq_num, timestamp, readings, flags)
+        packet.values_by_type = (temp, humid, volt)
+        return packet
 
     raise ValueError(f"Unreachable decoding state for msg_type: {msg_type}")
 
@@ -1,10 +1,18 @@
 import os
+import heapq
+import operator
+import queue
+import select
 import socket
+import sys
+import threading
 import csv
 import argparse
+import bisect
 import time
 from datetime import datetime, timedelta
-from collections import deque, OrderedDict, defaultdict
+from pathlib import Path
+from collections import deque, defaultdict
 from protocol_M_M import decode_packet, MSG_INIT, MSG_DATA, MSG_HEARTBEAT, SENSOR_TEMP, SENSOR_HUM, SENSOR_VOLT, \
     FLAG_BATCHING
 
@@ -17,9 +25,67 @@ except ImportError:
     PSUTIL_AVAILABLE = False
     print("[WARNING] psutil not available - CPU monitoring disabled")
 
+# Try to import numpy for vectorized gap interpolation, fallback if not available
+try:
+    import numpy as np
+
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+
+# Shared formatter for the CSV value columns. Default-arg bindings keep the
+# lookups local so the hot path avoids a branch + global lookup per field.
+def _fmt2(v, _fmt="{:.2f}".format, _null='<null>'):
+    return _null if v is None else _fmt(v)
+
+
+# C-level extractor for (sensor_type, value) pairs; avoids per-reading
+# LOAD_ATTR bytecode when walking large batches
+_GET_TYPE_VAL = operator.attrgetter('sensor_type', 'value')
+
+# Display names and units per sensor type, hoisted so the batch-details
+# emit loop does not rebuild them per reading
+SENSOR_TYPE_NAMES = {
+    SENSOR_TEMP: 'TEMPERATURE',
+    SENSOR_HUM: 'HUMIDITY',
+    SENSOR_VOLT: 'VOLTAGE'
+}
+
+SENSOR_TYPE_UNITS = {
+    SENSOR_TEMP: '°C',
+    SENSOR_HUM: '%',
+    SENSOR_VOLT: 'V'
+}
+
+
+
+class DeviceState:
+    """Per-device tracking state; __slots__ keeps the per-packet field
+    accesses on C-level attribute slots instead of dict lookups"""
+    __slots__ = ('last_seq', 'packets', 'duplicates', 'gaps', 'total_gap_packets', 'bytes',
+                 'buffer', 'buffer_heap', 'last_values', 'gap_start_time', 'last_heartbeat',
+                 'expected_hb_interval', 'is_batch_mode')
+
+    def __init__(self):
+        self.last_seq = -1
+        self.packets = 0
+        self.duplicates = 0
+        self.gaps = 0
+        self.total_gap_packets = 0
+        self.bytes = 0
+        self.buffer = {}
+        self.buffer_heap = []  # min-heap of buffered seq_nums (lazy deletion)
+        self.last_values = None
+        self.gap_start_time = None
+        self.last_heartbeat = None
+        self.expected_hb_interval = 5.0
+        self.is_batch_mode = False
+
 
 class Server:
-    def __init__(self, port, log_file, max_buffer_size=100, max_gap_wait_seconds=5, auto_shutdown_timeout=None):
+    def __init__(self, port, log_file, max_buffer_size=100, max_gap_wait_seconds=5, auto_shutdown_timeout=None,
+                 rcvbuf_bytes=16 * 1024 * 1024, rx_queue_len=10000, verbose=False, pin_core=None):
         self.port = port
         self.log_file = log_file
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
@@ -28,6 +94,17 @@ class Server:
         # Configuration
         self.max_buffer_size = max_buffer_size
         self.max_gap_wait_seconds = max_gap_wait_seconds
+        self.rcvbuf_bytes = rcvbuf_bytes
+        # Per-packet prints are a write syscall each; keep them off the hot
+        # path unless --verbose is given
+        self.verbose = verbose
+        self.pin_core = pin_core
+
+        # Receive/processing decoupling: the socket loop only enqueues raw
+        # datagrams; a consumer thread does decode + CSV work so slow disk
+        # writes never stall recvfrom
+        self.rx_queue = queue.Queue(maxsize=rx_queue_len)
+        self.rx_dropped = 0
 
         # Auto-shutdown feature
         self.auto_shutdown_timeout = auto_shutdown_timeout
@@ -39,26 +116,22 @@ class Server:
         self.packets_received = 0
         self.duplicate_count = 0
         self.sequence_gaps = 0
-        self.cpu_times = []
+        # Recent per-packet CPU samples (bounded) plus exact running totals so
+        # metrics stay O(1) and memory stops growing with uptime
+        self.cpu_times = deque(maxlen=10000)
+        self._cpu_sum = 0.0
+        self._cpu_n = 0
 
         # Per-device tracking for duplicate and gap detection
-        self.device_states = defaultdict(lambda: {
-            'last_seq': -1,
-            'packets': 0,
-            'duplicates': 0,
-            'gaps': 0,
-            "total_gap_packets": 0,  # <--- optional but recommended
-            'bytes': 0,
-            'buffer': OrderedDict(),
-            'last_values': None,
-            'gap_start_time': None,
-            'last_heartbeat': None,
-            'expected_hb_interval': 5.0,
-            'is_batch_mode': False
-        })
-
-        # Batch details CSV file
-        self.batch_details_file = log_file.replace('.csv', '_batch_details.csv')
+        # _sorted_device_ids is kept sorted as devices first appear so the
+        # shutdown report can iterate in order without a sort
+        self._sorted_device_ids = []
+        self.device_states = {}
+
+        # Batch details CSV file (derived from the stem so a '.csv'
+        # elsewhere in the path cannot be rewritten by accident)
+        log_path = Path(log_file)
+        self.batch_details_file = str(log_path.with_name(log_path.stem + '_batch_details.csv'))
         self.batch_details_writer = None
         self.batch_details_file_handle = None
 
@@ -71,16 +144,63 @@ class Server:
             except Exception:
                 self.psutil_available = False
 
-        # File handles
+        # Cached per-second prefix for timestamp column formatting
+        self._last_sec = -1
+        self._last_sec_str = ''
+
+        # Next wall-clock deadline for reorder-buffer cleanup
+        self._next_cleanup_time = 0.0
+
+        # Signals the background metrics reporter to stop at shutdown
+        self._stop_reporter = threading.Event()
+
+        # Min-heap of (arrival_time, device_id) for devices with buffered
+        # packets, so cleanup only touches devices whose head may have
+        # expired instead of scanning every device. Entries can be stale;
+        # they are reconciled against the real buffer when popped.
+        self._buffer_expiry_heap = []
+
+        # File handles; telemetry rows are staged in _wbuf and written to the
+        # raw fd in 64 KiB chunks (one write syscall per ~hundreds of rows)
         self.telemetry_file = None
+        self._telemetry_fd = None
+        self._wbuf = bytearray()
+
+        # Row template parsed once at startup; _write_row calls the bound
+        # format method instead of re-parsing an f-string per row
+        self._row_fmt = '{},{},{},{},{},{},{},{},{},{}\r\n'.format
 
     def run(self):
+        # Pin before any threads start so the consumer inherits the mask;
+        # keeping receive + processing on one core preserves cache locality
+        # for device_states and the row buffer. Best paired with the NIC RX
+        # IRQ on the same core (/proc/irq/<nic_irq>/smp_affinity).
+        if self.pin_core is not None:
+            if hasattr(os, 'sched_setaffinity'):
+                try:
+                    os.sched_setaffinity(0, {self.pin_core})
+                    print(f"[CONFIG] Pinned to CPU core {self.pin_core}")
+                except OSError as e:
+                    print(f"[WARNING] Could not pin to core {self.pin_core}: {e}")
+            else:
+                print("[WARNING] --pin-core ignored: sched_setaffinity not available on this platform")
+
+        # SO_REUSEPORT lets multiple worker processes bind the same port; the
+        # kernel hashes flows so each device stays sticky to one worker
+        if hasattr(socket, 'SO_REUSEPORT'):
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
         self.sock.bind(('0.0.0.0', self.port))
-        self.sock.settimeout(1.0)  # Timeout for cleanup checks
+        self.sock.setblocking(False)  # Drain bursts without a poll per datagram
+
+        # Enlarge the kernel receive buffer so bursts are not silently dropped
+        # before recvfrom sees them (the kernel may cap this at rmem_max)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.rcvbuf_bytes)
+        actual_rcvbuf = self.sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
 
         print(f"[SERVER] Listening on port {self.port}")
         print(f"[CONFIG] Max buffer size: {self.max_buffer_size} packets per device")
         print(f"[CONFIG] Max gap wait time: {self.max_gap_wait_seconds} seconds")
+        print(f"[CONFIG] Socket receive buffer: requested {self.rcvbuf_bytes}, got {actual_rcvbuf} bytes")
         if self.auto_shutdown_timeout:
             print(f"[CONFIG] Auto-shutdown after {self.auto_shutdown_timeout}s of no packets")
 
@@ -90,7 +210,7 @@ class Server:
         # Initialize batch details CSV
         self.initialize_batch_details_csv()
 
-        with open(self.log_file, 'w', newline='', encoding='utf-8') as f:
+        with open(self.log_file, 'w', newline='', encoding='utf-8', buffering=1 << 20) as f:
 
             self.telemetry_file = f
             writer = csv.writer(f)
@@ -100,103 +220,214 @@ class Server:
                  'Humid_Pct', 'Volt_V'])
             self.telemetry_file.flush()
 
-            try:
-                while True:
-                    try:
-                        # Measure CPU time for this packet
-                        cpu_start = time.perf_counter()
-                        data, addr = self.sock.recvfrom(1024)
-                        arrival_time = time.time()  # Capture precise arrival time immediately
-                        self.packet_count += 1
-                        self.last_packet_time = arrival_time  # Update last packet time
-
-                        # Update metrics
-
-                        packet_size = len(data)
-                        self.total_bytes_received += packet_size
-                        self.packets_received += 1
+            # After the header, telemetry rows bypass the TextIOWrapper (and
+            # its per-write lock) entirely: they accumulate in a userspace
+            # byte buffer that is pushed to the raw fd in 64 KiB writes
+            self._telemetry_fd = f.fileno()
 
-                        try:
-                            packet = decode_packet(data)
-                            timestamp = datetime.now()
+            consumer = threading.Thread(target=self._consume_loop, args=(writer,), daemon=True)
+            consumer.start()
 
-                            # Update device state metrics (device_state created automatically by defaultdict)
+            # Periodic metrics come from a reporter thread reading the O(1)
+            # running counters, so the packet path never formats or prints a
+            # metrics line
+            reporter = threading.Thread(target=self._report_loop, daemon=True)
+            reporter.start()
 
-                            self._process_telemetry(packet, timestamp, arrival_time, writer, packet_size)
+            # Bind hot attributes to locals once; the loop below runs per
+            # packet and LOAD_FAST is much cheaper than attribute lookups
+            sock = self.sock
+            recvfrom = sock.recvfrom
+            sel = select.select
+            now = time.time
+            put_nowait = self.rx_queue.put_nowait
 
-                            # Measure CPU time for this packet (basic timing)
-                            cpu_end = time.perf_counter()
-                            cpu_time_ms = (cpu_end - cpu_start) * 1000
-                            self.cpu_times.append(cpu_time_ms)
-
-                            if self.packet_count % 100 == 0:
-                                self._cleanup_old_buffers(timestamp, writer)
-
-                            # Print periodic metrics (every 50 packets)
-                            if self.packet_count % 50 == 0:
-                                current_metrics = self.calculate_metrics()
-                                print(f"[METRICS] Packets: {current_metrics['packets_received']}, "
-                                      f"Avg size: {current_metrics['bytes_per_report']:.1f}B, "
-                                      f"Duplicates: {current_metrics['duplicate_rate']:.2f}%, "
-                                      f"Gaps: {current_metrics['sequence_gap_count']}, "
-                                      f"CPU: {current_metrics['cpu_ms_per_report']:.3f}ms/pkt")
-                        except Exception as e:
-                            print(f"[ERROR] Decode failed: {e}")
+            try:
+                while True:
+                    # Wait once per burst, then drain everything already queued
+                    # so a batch of datagrams costs one wakeup instead of one
+                    # poll per packet
+                    ready, _, _ = sel([sock], [], [], 1.0)
 
-                    except socket.timeout:
+                    if not ready:
                         # Check for auto-shutdown
                         if self.auto_shutdown_timeout and self.last_packet_time:
                             time_since_last = time.time() - self.last_packet_time
                             if time_since_last >= self.auto_shutdown_timeout:
                                 print(f"\n[SERVER] Auto-shutdown: No packets for {self.auto_shutdown_timeout}s")
                                 break
-                        self._cleanup_old_buffers(datetime.now(), writer)
                         continue
 
+                    while True:
+                        try:
+                            data, addr = recvfrom(1024)
+                        except BlockingIOError:
+                            break  # Burst drained
+                        arrival_time = now()  # Capture precise arrival time immediately
+                        self.last_packet_time = arrival_time
+                        try:
+                            put_nowait((data, arrival_time))
+                        except queue.Full:
+                            self.rx_dropped += 1
+
             except KeyboardInterrupt:
                 print(f"\n[SERVER] Shutting down...")
 
+            # Stop the consumer and let it finish the queued backlog
+            self._stop_reporter.set()
+            self.rx_queue.put(None)
+            consumer.join()
+
+            if self.rx_dropped:
+                print(f"[WARNING] Dropped {self.rx_dropped} packets on the receive queue")
+
+            # Push any buffered rows to disk before the file closes
+            self._flush_logs()
+
         # Finalize and save metrics
         self.finalize_and_save_metrics()
         self.sock.close()
 
-    def _process_telemetry(self, packet, timestamp, arrival_time, writer, packet_size):
-        timestamp_str = datetime.fromtimestamp(arrival_time).strftime('%Y-%m-%d %H:%M:%S.%f')
+    def _flush_logs(self):
+        """Flush buffered telemetry rows and the batch-details CSV"""
+        if self._wbuf:
+            os.write(self._telemetry_fd, self._wbuf)
+            self._wbuf.clear()
+        if self.batch_details_file_handle:
+            self.batch_details_file_handle.flush()
+
+    def _consume_loop(self, writer):
+        """Consumer thread: process queued datagrams until the None sentinel"""
+        # Local bindings for the per-packet loop
+        get = self.rx_queue.get
+        handle = self._handle_datagram
+
+        while True:
+            try:
+                item = get(timeout=1.0)
+            except queue.Empty:
+                # Idle tick: release any expired reorder buffers and push
+                # pending rows to disk
+                self._cleanup_old_buffers(time.time(), writer)
+                self._flush_logs()
+                continue
+            if item is None:
+                break
+            data, arrival_time = item
+            handle(data, arrival_time, writer)
+
+    def _report_loop(self):
+        """Reporter thread: print a metrics snapshot every 5 seconds.
+
+        Reads only the running scalar counters (no locking needed for a
+        status line), so the packet path never pays for formatting."""
+        while not self._stop_reporter.wait(5.0):
+            if not self.packets_received:
+                continue
+            current_metrics = self.calculate_metrics()
+            print(f"[METRICS] Packets: {current_metrics['packets_received']}, "
+                  f"Avg size: {current_metrics['bytes_per_report']:.1f}B, "
+                  f"Duplicates: {current_metrics['duplicate_rate']:.2f}%, "
+                  f"Gaps: {current_metrics['sequence_gap_count']}, "
+                  f"CPU: {current_metrics['cpu_ms_per_report']:.3f}ms/pkt")
+
+    def _handle_datagram(self, data, arrival_time, writer):
+        """Decode and process one received datagram, updating metrics"""
+        # Measure CPU time for this packet
+        cpu_start = time.perf_counter()
+        self.packet_count += 1
+
+        # Update metrics
+
+        packet_size = len(data)
+        self.total_bytes_received += packet_size
+        self.packets_received += 1
+
+        try:
+            packet = decode_packet(data)
+
+            # Update device state metrics (DeviceState allocated on first packet)
+
+            self._process_telemetry(packet, arrival_time, writer, packet_size)
+
+            # Measure CPU time for this packet (basic timing)
+            cpu_end = time.perf_counter()
+            cpu_time_ms = (cpu_end - cpu_start) * 1000
+            self.cpu_times.append(cpu_time_ms)
+            self._cpu_sum += cpu_time_ms
+            self._cpu_n += 1
+
+            # Batched flush: one flush per 200 packets instead of per row
+            if self.packet_count % 200 == 0:
+                self._flush_logs()
+
+            # Cleanup runs on a wall-clock schedule rather than every N
+            # packets, so buffer expiry is independent of the packet rate
+            if arrival_time >= self._next_cleanup_time:
+                self._next_cleanup_time = arrival_time + 1.0
+                self._cleanup_old_buffers(arrival_time, writer)
+
+        except Exception as e:
+            print(f"[ERROR] Decode failed: {e}")
+
+    def _write_row(self, timestamp_str, precise_time, device_id, seq_num, msg_type, is_dup, is_gap,
+                   temp_str, humid_str, volt_str):
+        """Write one telemetry row, bypassing csv.writer's per-field quoting.
+
+        All fields on the data path are plain numbers or fixed strings, so a
+        join + single write is equivalent and much cheaper; csv.writer is kept
+        for the header and the metrics report."""
+        self._wbuf += self._row_fmt(timestamp_str, precise_time, device_id, seq_num, msg_type, is_dup, is_gap,
+                                    temp_str, humid_str, volt_str).encode()
+        if len(self._wbuf) >= 65536:
+            os.write(self._telemetry_fd, self._wbuf)
+            self._wbuf.clear()
+
+    def _process_telemetry(self, packet, arrival_time, writer, packet_size):
+        # Reuse the formatted second and only format the microseconds per
+        # packet; datetime.now()/fromtimestamp cost full object construction
+        sec = int(arrival_time)
+        if sec != self._last_sec:
+            self._last_sec = sec
+            self._last_sec_str = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(sec))
+        timestamp_str = f"{self._last_sec_str}.{int((arrival_time - sec) * 1e6):06d}"
         precise_time = f"{arrival_time:.6f}"  # Unix timestamp with 6 decimal places
 
-        # Device state is automatically created by defaultdict
+        # Device state is allocated on a device's first packet
 
-        device_state = self.device_states[packet.device_id]
+        device_state = self.device_states.get(packet.device_id)
+        if device_state is None:
+            bisect.insort(self._sorted_device_ids, packet.device_id)
+            device_state = self.device_states[packet.device_id] = DeviceState()
 
         # --- FIX: INCREMENT COUNTERS HERE ---
-        device_state['packets'] += 1
-        device_state['bytes'] += packet_size
-        device_state['is_batch_mode'] = (packet.flags & FLAG_BATCHING) != 0
+        device_state.packets += 1
+        device_state.bytes += packet_size
+        device_state.is_batch_mode = (packet.flags & FLAG_BATCHING) != 0
         # ------------------------------------
 
-        buffer = device_state['buffer']
+        buffer = device_state.buffer
         current_seq = packet.seq_num
-        last_seq = device_state['last_seq']
+        last_seq = device_state.last_seq
 
         # --- INIT Message ---
         if packet.msg_type != MSG_DATA:
             if packet.msg_type == MSG_INIT:
-                print(f"[{self.packet_count}] INIT device {packet.device_id}")
-                device_state['last_seq'] = packet.seq_num
-                device_state['last_values'] = None  # Reset values
-                device_state['gap_start_time'] = None
+                if self.verbose:
+                    print(f"[{self.packet_count}] INIT device {packet.device_id}")
+                device_state.last_seq = packet.seq_num
+                device_state.last_values = None  # Reset values
+                device_state.gap_start_time = None
 
-                writer.writerow(
-                    [timestamp_str, precise_time, packet.device_id, packet.seq_num, 'INIT', 0, 0, '<null>', '<null>',
-                     '<null>'])
-                self.telemetry_file.flush()
+                self._write_row(timestamp_str, precise_time, packet.device_id, packet.seq_num, 'INIT', 0, 0,
+                                '<null>', '<null>', '<null>')
 
-                self._process_buffered_packets(packet.device_id, timestamp, writer)
+                self._process_buffered_packets(packet.device_id, arrival_time, writer)
                 return
 
             if packet.msg_type == MSG_HEARTBEAT:
 
-                last_seq = device_state['last_seq']
+                last_seq = device_state.last_seq
                 current_seq = packet.seq_num
                 is_duplicate = 0
                 is_gap = 0
@@ -204,17 +435,15 @@ class Server:
                 # --- DUPLICATE HEARTBEAT ---
                 if last_seq != -1 and current_seq <= last_seq:
                     is_duplicate = 1
-                    print(f"[{self.packet_count}] HEARTBEAT device {packet.device_id} [DUPLICATE]")
+                    if self.verbose:
+                        print(f"[{self.packet_count}] HEARTBEAT device {packet.device_id} [DUPLICATE]")
 
-                    device_state['duplicates'] += 1
+                    device_state.duplicates += 1
                     self.duplicate_count += 1
 
-                    writer.writerow([
-                        timestamp_str, precise_time, packet.device_id,
-                        packet.seq_num, 'HEARTBEAT', is_duplicate, is_gap,
-                        '<null>', '<null>', '<null>'
-                    ])
-                    self.telemetry_file.flush()
+                    self._write_row(timestamp_str, precise_time, packet.device_id,
+                                    packet.seq_num, 'HEARTBEAT', is_duplicate, is_gap,
+                                    '<null>', '<null>', '<null>')
 
                     return
 
@@ -225,33 +454,29 @@ class Server:
                         is_gap = 1
                         gap_size = current_seq - expected_next
 
-                        print(
-                            f"[{self.packet_count}] GAP DETECTED on device {packet.device_id}: missing seq {expected_next} → {current_seq - 1} ({gap_size})")
+                        if self.verbose:
+                            print(
+                                f"[{self.packet_count}] GAP DETECTED on device {packet.device_id}: missing seq {expected_next} → {current_seq - 1} ({gap_size})")
 
-                        device_state['gaps'] += 1
-                        device_state['total_gap_packets'] += gap_size  # FIXED
+                        device_state.gaps += 1
+                        device_state.total_gap_packets += gap_size  # FIXED
                         self.sequence_gaps += gap_size
 
-                        writer.writerow([
-                            timestamp_str, precise_time, packet.device_id,
-                            packet.seq_num, 'HEARTBEAT', is_duplicate, is_gap,
-                            '<null>', '<null>', '<null>'
-                        ])
+                        self._write_row(timestamp_str, precise_time, packet.device_id,
+                                        packet.seq_num, 'HEARTBEAT', is_duplicate, is_gap,
+                                        '<null>', '<null>', '<null>')
                         # DO NOT interpolate HB packet
-                print(f"[{self.packet_count}] HEARTBEAT device {packet.device_id} [IN-ORDER]")
+                if self.verbose:
+                    print(f"[{self.packet_count}] HEARTBEAT device {packet.device_id} [IN-ORDER]")
 
                 # --- NORMAL HEARTBEAT ---
-                device_state['last_seq'] = current_seq
+                device_state.last_seq = current_seq
                 # KEEP last_values (do NOT erase it)
-                device_state['gap_start_time'] = None
-
-                writer.writerow([
-                    timestamp_str, precise_time, packet.device_id,
-                    packet.seq_num, 'HEARTBEAT', is_duplicate, is_gap,
-                    '<null>', '<null>', '<null>',
+                device_state.gap_start_time = None
 
-                ])
-                self.telemetry_file.flush()
+                self._write_row(timestamp_str, precise_time, packet.device_id,
+                                packet.seq_num, 'HEARTBEAT', is_duplicate, is_gap,
+                                '<null>', '<null>', '<null>')
                 return
 
 
@@ -260,29 +485,31 @@ class Server:
             # --- DATA Message ---
             # 1. Duplicate Check
             if current_seq <= last_seq:
-                print(f"[{self.packet_count}] DATA {packet.device_id} seq={current_seq} [DUPLICATE]")
-                device_state['duplicates'] += 1
+                if self.verbose:
+                    print(f"[{self.packet_count}] DATA {packet.device_id} seq={current_seq} [DUPLICATE]")
+                device_state.duplicates += 1
                 self.duplicate_count += 1
                 self._log_data_packet(packet, timestamp_str, precise_time, writer, 1, 0, packet.device_id)
                 return
 
             # 2. In-Order Check
             if current_seq == last_seq + 1:
-                print(f"[{self.packet_count}] DATA {packet.device_id} seq={current_seq} [IN-ORDER]")
+                if self.verbose:
+                    print(f"[{self.packet_count}] DATA {packet.device_id} seq={current_seq} [IN-ORDER]")
                 self._log_data_packet(packet, timestamp_str, precise_time, writer, 0, 0, packet.device_id)
 
                 # Update last_values for interpolation
-                device_state['last_values'] = self._get_packet_values(packet)
-                device_state['last_seq'] = current_seq
-                device_state['gap_start_time'] = None
+                device_state.last_values = self._get_packet_values(packet)
+                device_state.last_seq = current_seq
+                device_state.gap_start_time = None
 
-                self._process_buffered_packets(packet.device_id, timestamp, writer)
+                self._process_buffered_packets(packet.device_id, arrival_time, writer)
                 return
 
             # 3. Gap Detected
             # Check Timeout Logic
-            if device_state['gap_start_time'] is not None:
-                gap_age = (timestamp - device_state['gap_start_time']).total_seconds()
+            if device_state.gap_start_time is not None:
+                gap_age = arrival_time - device_state.gap_start_time
                 if gap_age > self.max_gap_wait_seconds:
                     # TIMEOUT: We waited too long. We must fill the gap STAT.
                     print(f"[TIMEOUT] Filling gap after seq={last_seq}")
@@ -290,8 +517,8 @@ class Server:
                     # Determine the 'End' of the gap.
                     # It is either the first packet in buffer OR the current packet.
                     if buffer:
-                        next_avail_seq = next(iter(buffer))
-                        next_packet = buffer[next_avail_seq]['packet']
+                        next_avail_seq = self._buffer_min_seq(device_state)
+                        next_packet = buffer[next_avail_seq][0]
                     else:
                         next_avail_seq = current_seq
                         next_packet = packet
@@ -303,57 +530,67 @@ class Server:
                     # We assume the missing packets had the same structure (batch size) as the current packet.
                     batch_size = len(next_packet.readings)
                     # Interpolate from last_seq to next_avail_seq
-                    start_vals = device_state['last_values']
+                    start_vals = device_state.last_values
                     end_vals = self._get_first_packet_values(
                         next_packet)  # This now holds FIRST values of next packet (Fixed)
                     gap_size = next_avail_seq - last_seq - 1
-                    device_state['gaps'] += gap_size
+                    device_state.gaps += gap_size
                     self.sequence_gaps += gap_size
 
                     self._interpolate_and_log(packet.device_id, last_seq, next_avail_seq,
-                                              start_vals, end_vals, timestamp_str, writer, 0, 1, batch_size=batch_size)
+                                              start_vals, end_vals, timestamp_str, writer, 0, 1, batch_size=batch_size,
+                                              recv_time=arrival_time)
 
                     # Advance state to just before the next available packet
-                    device_state['last_seq'] = next_avail_seq - 1
-                    device_state['gap_start_time'] = None
+                    device_state.last_seq = next_avail_seq - 1
+                    device_state.gap_start_time = None
 
                     # Now process the buffered packets (or current) naturally
-                    if current_seq == device_state['last_seq'] + 1:
+                    if current_seq == device_state.last_seq + 1:
                         # Current packet is now next
                         self._log_data_packet(packet, timestamp_str, precise_time, writer, 0, 0, packet.device_id)
-                        device_state['last_values'] = self._get_packet_values(packet)
-                        device_state['last_seq'] = current_seq
+                        device_state.last_values = self._get_packet_values(packet)
+                        device_state.last_seq = current_seq
                     else:
                         # Check buffer
-                        self._process_buffered_packets(packet.device_id, timestamp, writer)
+                        self._process_buffered_packets(packet.device_id, arrival_time, writer)
 
                     # If current packet is still a gap relative to the NEW position, buffer it
-                    if current_seq > device_state['last_seq'] + 1:
-                        self._add_to_buffer(packet, timestamp, timestamp_str, precise_time, device_state)
+                    if current_seq > device_state.last_seq + 1:
+                        self._add_to_buffer(packet, arrival_time, timestamp_str, precise_time, device_state)
                     return
 
             # 4. Buffer the packet (Wait)
-            self._add_to_buffer(packet, timestamp, timestamp_str, precise_time, device_state)
-
-    def _add_to_buffer(self, packet, timestamp, timestamp_str, precise_time, device_state):
-        buffer = device_state['buffer']
+            self._add_to_buffer(packet, arrival_time, timestamp_str, precise_time, device_state)
+
+    @staticmethod
+    def _buffer_min_seq(device_state):
+        """Peek the lowest buffered seq_num, discarding stale heap entries"""
+        buffer = device_state.buffer
+        heap = device_state.buffer_heap
+        while heap and heap[0] not in buffer:
+            heapq.heappop(heap)
+        return heap[0] if heap else None
+
+    def _add_to_buffer(self, packet, arrival_time, timestamp_str, precise_time, device_state):
+        buffer = device_state.buffer
         current_seq = packet.seq_num
 
         if len(buffer) >= self.max_buffer_size:
-            buffer.pop(next(iter(buffer)))
-
-        buffer[current_seq] = {
-            'packet': packet,
-            'timestamp': timestamp_str,
-            'precise_time': precise_time,
-            'arrival_time': timestamp,
-            'logged': False
-        }
-        device_state['buffer'] = OrderedDict(sorted(buffer.items()))
-        print(f"[BUFFERED] Device {packet.device_id}: seq={current_seq}")
+            buffer.pop(self._buffer_min_seq(device_state))
+
+        if current_seq not in buffer:
+            heapq.heappush(device_state.buffer_heap, current_seq)
+        # Compact fixed-shape entry: (packet, timestamp, precise_time,
+        # arrival_time). A tuple is one small allocation versus a five-slot
+        # dict per buffered packet.
+        buffer[current_seq] = (packet, timestamp_str, precise_time, arrival_time)
+        if self.verbose:
+            print(f"[BUFFERED] Device {packet.device_id}: seq={current_seq}")
 
-        if device_state['gap_start_time'] is None:
-            device_state['gap_start_time'] = timestamp
+        if device_state.gap_start_time is None:
+            device_state.gap_start_time = arrival_time
+            heapq.heappush(self._buffer_expiry_heap, (arrival_time, packet.device_id))
 
     def initialize_batch_details_csv(self):
         """Initialize the batch details CSV file"""
@@ -379,113 +616,117 @@ class Server:
         if not self.batch_details_writer or not readings:
             return
 
-        # Group readings by sensor type for batch statistics
-        from collections import defaultdict
-        sensor_groups = defaultdict(list)
+        # Normalize to (sensor_type, value) pairs once; readings are either
+        # dicts (from interpolation) or SensorReading objects (from packets)
+        if isinstance(readings[0], dict):
+            pairs = [(r['sensor_type'], r['value']) for r in readings]
+        else:
+            pairs = [_GET_TYPE_VAL(r) for r in readings]
 
         # First Pass: Collect all values to calculate Averages/Min/Max
-        for reading in readings:
-            # CHECK: Is this a dictionary (from interpolation) or object (from packet)?
-            if isinstance(reading, dict):
-                val = reading['value']
-                s_type = reading['sensor_type']
-            else:
-                val = reading.value
-                s_type = reading.sensor_type
-
+        sensor_groups = defaultdict(list)
+        for s_type, val in pairs:
             sensor_groups[s_type].append(val)
 
-        # Second Pass: Write rows
-        for i, reading in enumerate(readings):
-            # CHECK: Get values again
-            if isinstance(reading, dict):
-                val = reading['value']
-                s_type = reading['sensor_type']
-            else:
-                val = reading.value
-                s_type = reading.sensor_type
-
-            sensor_type_name = {
-                SENSOR_TEMP: 'TEMPERATURE',
-                SENSOR_HUM: 'HUMIDITY',
-                SENSOR_VOLT: 'VOLTAGE'
-            }.get(s_type, f'UNKNOWN_{s_type}')
-
-            unit = {
-                SENSOR_TEMP: '°C',
-                SENSOR_HUM: '%',
-                SENSOR_VOLT: 'V'
-            }.get(s_type, '')
-
-            # Calculate batch statistics for this sensor type
-            sensor_values = sensor_groups[s_type]
+        # Pre-compute per-sensor statistics once instead of per reading
+        sensor_stats = {}
+        for s_type, sensor_values in sensor_groups.items():
             batch_avg = sum(sensor_values) / len(sensor_values)
-            batch_min = min(sensor_values)
-            batch_max = max(sensor_values)
+            sensor_stats[s_type] = (f"{batch_avg:.3f}",
+                                    f"{min(sensor_values):.3f}",
+                                    f"{max(sensor_values):.3f}")
+
+        # Second Pass: Write rows
+        batch_size = len(readings)
+        for i, (s_type, val) in enumerate(pairs):
+            sensor_type_name = SENSOR_TYPE_NAMES.get(s_type, f'UNKNOWN_{s_type}')
+            unit = SENSOR_TYPE_UNITS.get(s_type, '')
+            batch_avg, batch_min, batch_max = sensor_stats[s_type]
 
             self.batch_details_writer.writerow([
-                timestamp, device_id, seq_num, int(is_dup), int(is_gap), len(readings), i + 1,
+                timestamp, device_id, seq_num, int(is_dup), int(is_gap), batch_size, i + 1,
                 sensor_type_name, f"{val:.3f}", unit,
-                f"{batch_avg:.3f}", f"{batch_min:.3f}", f"{batch_max:.3f}"
+                batch_avg, batch_min, batch_max
             ])
 
-        # Flush to ensure data is written
-        if self.batch_details_file_handle:
-            self.batch_details_file_handle.flush()
+        # Flushing is batched with the telemetry CSV in _handle_datagram
 
-    def _process_buffered_packets(self, device_id, timestamp, writer):
+    def _process_buffered_packets(self, device_id, arrival_time, writer):
         device_state = self.device_states[device_id]
-        buffer = device_state['buffer']
-        last_seq = device_state['last_seq']
+        buffer = device_state.buffer
+        last_seq = device_state.last_seq
 
         while buffer:
-            next_seq = next(iter(buffer))
+            next_seq = self._buffer_min_seq(device_state)
             if next_seq == last_seq + 1:
-                item = buffer.pop(next_seq)
-                print(f"[REORDER] releasing seq={next_seq}")
-                self._log_data_packet(item['packet'], item['timestamp'], item['precise_time'], writer, 0, 0, device_id)
+                buffered_packet, buffered_ts, buffered_precise, _ = buffer.pop(next_seq)
+                if self.verbose:
+                    print(f"[REORDER] releasing seq={next_seq}")
+                self._log_data_packet(buffered_packet, buffered_ts, buffered_precise, writer, 0, 0, device_id)
 
                 # Update state
-                device_state['last_values'] = self._get_packet_values(item['packet'])
-                device_state['last_seq'] = next_seq
+                device_state.last_values = self._get_packet_values(buffered_packet)
+                device_state.last_seq = next_seq
                 last_seq = next_seq
             else:
                 break
 
         if not buffer:
-            device_state['gap_start_time'] = None
+            device_state.gap_start_time = None
 
     def _cleanup_old_buffers(self, current_time, writer):
-        for device_id, state in self.device_states.items():
-            buffer = state['buffer']
-            if not buffer: continue
-
-            oldest = buffer[next(iter(buffer))]
-            if (current_time - oldest['arrival_time']).total_seconds() > self.max_gap_wait_seconds * 2:
-                print(f"[CLEANUP] Force filling gap for device {device_id}")
-
-                # Force fill gap up to the first buffered packet
-                first_buff_seq = next(iter(buffer))
-                first_buff_packet = buffer[first_buff_seq]['packet']
-
-                ##########################################################################################################################################################################################
-                ##########################################################################################################################################################################################
-                ##########################################################################################################################################################################################
-                # MODIFIED: Determine batch size from the buffered packet we are bridging to
-                batch_size = len(first_buff_packet.readings)
-
-                start_vals = state['last_values']
-                end_vals = self._get_first_packet_values(
-                    first_buff_packet)  # This now holds FIRST values of next packet (Fixed)
-                self._interpolate_and_log(device_id, state['last_seq'], first_buff_seq,
-                                          start_vals, end_vals, oldest['timestamp'], writer, 0, 1,
-                                          batch_size=batch_size)
-
-                state['last_seq'] = first_buff_seq - 1
-                self._process_buffered_packets(device_id, current_time, writer)
+        # Pop only devices whose queued head may have expired; the rest of
+        # the heap stays untouched, so cost scales with expirations rather
+        # than the total device count
+        expiry_heap = self._buffer_expiry_heap
+        cutoff = current_time - self.max_gap_wait_seconds * 2
+        while expiry_heap and expiry_heap[0][0] < cutoff:
+            _, device_id = heapq.heappop(expiry_heap)
+            state = self.device_states[device_id]
+            buffer = state.buffer
+            if not buffer:
+                continue  # Stale entry: buffer drained via reordering
+
+            first_buff_seq = self._buffer_min_seq(state)
+            first_buff_packet, oldest_ts, _, oldest_arrival = buffer[first_buff_seq]
+            if oldest_arrival >= cutoff:
+                # Head changed since this entry was queued; re-arm with the
+                # real arrival time and stop expiring
+                heapq.heappush(expiry_heap, (oldest_arrival, device_id))
+                continue
+
+            print(f"[CLEANUP] Force filling gap for device {device_id}")
+
+            ##########################################################################################################################################################################################
+            ##########################################################################################################################################################################################
+            ##########################################################################################################################################################################################
+            # MODIFIED: Determine batch size from the buffered packet we are bridging to
+            batch_size = len(first_buff_packet.readings)
+
+            start_vals = state.last_values
+            end_vals = self._get_first_packet_values(
+                first_buff_packet)  # This now holds FIRST values of next packet (Fixed)
+            self._interpolate_and_log(device_id, state.last_seq, first_buff_seq,
+                                      start_vals, end_vals, oldest_ts, writer, 0, 1,
+                                      batch_size=batch_size)
+
+            state.last_seq = first_buff_seq - 1
+            self._process_buffered_packets(device_id, current_time, writer)
+
+            if buffer:
+                # Another gap remains behind the new head; queue it for the
+                # next cleanup pass
+                next_head = buffer[self._buffer_min_seq(state)]
+                heapq.heappush(expiry_heap, (next_head[3], device_id))
 
     # --- NEW HELPER: Get Values (T, H, V) based on sensor type ---
     def _get_packet_values(self, packet):
+        # decode_packet materializes this tuple in the same pass that builds
+        # the readings, so decoded packets skip the loop below entirely
+        values = getattr(packet, 'values_by_type', None)
+        if values is not None:
+            return values
+
         # Initialize all values as None (will be <null> in CSV)
         temp = None
         humid = None
@@ -537,10 +778,15 @@ class Server:
     ##########################################################################################################################################################################################
     # MODIFIED: Interpolation that respects missing sensors (Does not force 0s)
     def _interpolate_and_log(self, device_id, start_seq, end_seq, start_vals, end_vals, timestamp_str, writer,
-                             is_duplicate, is_gap, batch_size=1):
+                             is_duplicate, is_gap, batch_size=1, recv_time=None):
         count = end_seq - start_seq - 1
         if count <= 0: return
 
+        # Capture the clock once for all interpolated rows instead of per-row time.time() calls
+        if recv_time is None:
+            recv_time = time.time()
+        precise_time = f"{recv_time:.6f}"
+
         # Handle edge case: missing start values (first packet lost)
         if start_vals is None: start_vals = end_vals
 
@@ -563,6 +809,10 @@ class Server:
 
             current_vals = list(start_vals)
 
+            # Sensors that can actually be stepped, resolved once so the inner
+            # loop below does not re-test None per sensor per reading
+            active = [i for i in range(3) if steps[i] is not None and current_vals[i] is not None]
+
             # Outer Loop: Packets
             for pkt_idx in range(count):
                 seq = start_seq + 1 + pkt_idx
@@ -575,9 +825,8 @@ class Server:
                 # Inner Loop: Readings
                 for r_idx in range(batch_size):
                     # Increment values ONLY if valid
-                    for i in range(3):
-                        if steps[i] is not None and current_vals[i] is not None:
-                            current_vals[i] += steps[i]
+                    for i in active:
+                        current_vals[i] += steps[i]
 
                     # Store for averaging AND batch details
                     # IMPORTANT: Only append if the sensor actually exists (is not None)
@@ -604,19 +853,41 @@ class Server:
                 avg_v = sum(batch_volts) / len(batch_volts) if batch_volts else None
 
                 # Format strings (Use <null> if None)
-                temp_str = f"{avg_t:.2f}" if avg_t is not None else '<null>'
-                humid_str = f"{avg_h:.2f}" if avg_h is not None else '<null>'
-                volt_str = f"{avg_v:.2f}" if avg_v is not None else '<null>'
+                temp_str = _fmt2(avg_t)
+                humid_str = _fmt2(avg_h)
+                volt_str = _fmt2(avg_v)
 
-                writer.writerow([
-                    timestamp_str, f"{time.time():.6f}", device_id, seq, 'DATA', is_duplicate, is_gap,
-                    temp_str, humid_str, volt_str
-                ])
+                self._write_row(timestamp_str, precise_time, device_id, seq, 'DATA', is_duplicate, is_gap,
+                                temp_str, humid_str, volt_str)
 
         # --- BRANCH: NORMAL MODE ---
         else:
             print(f"   >>> Estimating {count} packets (Seq {start_seq + 1} to {end_seq - 1}) [NORMAL MODE]")
 
+            # Vectorized path: compute all interpolated values per sensor with
+            # one linspace each and emit the rows in a single writerows call
+            if NUMPY_AVAILABLE:
+                cols = []
+                for i in range(3):
+                    if start_vals[i] is not None and end_vals[i] is not None:
+                        seg = np.linspace(start_vals[i], end_vals[i], count + 2)[1:-1]
+                        cols.append(np.char.mod('%.2f', seg).tolist())
+                    elif start_vals[i] is not None:
+                        # No end value to interpolate toward: repeat the start
+                        # value, matching the scalar fallback below
+                        cols.append([_fmt2(start_vals[i])] * count)
+                    else:
+                        cols.append(['<null>'] * count)
+
+                self._wbuf += ''.join(
+                    f"{timestamp_str},{precise_time},{device_id},{start_seq + 1 + i},DATA,{is_duplicate},{is_gap},"
+                    f"{cols[0][i]},{cols[1][i]},{cols[2][i]}\r\n"
+                    for i in range(count)).encode()
+                if len(self._wbuf) >= 65536:
+                    os.write(self._telemetry_fd, self._wbuf)
+                    self._wbuf.clear()
+                return
+
             steps = [None, None, None]
             divisor = count + 1
 
@@ -627,66 +898,63 @@ class Server:
                     steps[i] = None
 
             current_vals = list(start_vals)
+            active = [k for k in range(3) if steps[k] is not None and current_vals[k] is not None]
 
             for i in range(count):
                 seq = start_seq + 1 + i
 
-                for k in range(3):
-                    if steps[k] is not None and current_vals[k] is not None:
-                        current_vals[k] += steps[k]
+                for k in active:
+                    current_vals[k] += steps[k]
 
-                temp_str = f"{current_vals[0]:.2f}" if current_vals[0] is not None else '<null>'
-                humid_str = f"{current_vals[1]:.2f}" if current_vals[1] is not None else '<null>'
-                volt_str = f"{current_vals[2]:.2f}" if current_vals[2] is not None else '<null>'
+                temp_str = _fmt2(current_vals[0])
+                humid_str = _fmt2(current_vals[1])
+                volt_str = _fmt2(current_vals[2])
 
-                writer.writerow([
-                    timestamp_str, f"{time.time():.6f}", device_id, seq, 'DATA', is_duplicate, is_gap,
-                    temp_str, humid_str, volt_str
-                ])
+                self._write_row(timestamp_str, precise_time, device_id, seq, 'DATA', is_duplicate, is_gap,
+                                temp_str, humid_str, volt_str)
 
-        if self.telemetry_file: self.telemetry_file.flush()
 
     def _log_data_packet(self, packet, timestamp_str, precise_time, writer, is_dup, is_gap, device_id):
         temp, humid, volt = self._get_packet_values(packet)
 
         is_batched = (packet.flags & FLAG_BATCHING) != 0
-        self.device_states[packet.device_id]['is_batch_mode'] = is_batched
+        self.device_states[packet.device_id].is_batch_mode = is_batched
 
         if is_batched:
             # Log individual readings to batch details CSV
             self.log_batch_details(timestamp_str, packet.device_id, packet.seq_num, packet.readings, is_dup, is_gap)
 
-            # Calculate averages for main CSV
-            from collections import defaultdict
-            sensor_sums = defaultdict(list)
-
-            # Group readings by sensor type
-            for reading in packet.readings:
-                sensor_sums[reading.sensor_type].append(reading.value)
-
-            # Calculate averages
-            temp_avg = sum(sensor_sums[SENSOR_TEMP]) / len(
-                sensor_sums[SENSOR_TEMP]) if SENSOR_TEMP in sensor_sums else None
-            humid_avg = sum(sensor_sums[SENSOR_HUM]) / len(
-                sensor_sums[SENSOR_HUM]) if SENSOR_HUM in sensor_sums else None
-            volt_avg = sum(sensor_sums[SENSOR_VOLT]) / len(
-                sensor_sums[SENSOR_VOLT]) if SENSOR_VOLT in sensor_sums else None
+            # Calculate averages for main CSV in a single pass with scalar
+            # accumulators (no per-packet defaultdict of lists)
+            sum_t = sum_h = sum_v = 0.0
+            n_t = n_h = n_v = 0
+            for s_type, val in map(_GET_TYPE_VAL, packet.readings):
+                if s_type == SENSOR_TEMP:
+                    sum_t += val
+                    n_t += 1
+                elif s_type == SENSOR_HUM:
+                    sum_h += val
+                    n_h += 1
+                elif s_type == SENSOR_VOLT:
+                    sum_v += val
+                    n_v += 1
+
+            temp_avg = sum_t / n_t if n_t else None
+            humid_avg = sum_h / n_h if n_h else None
+            volt_avg = sum_v / n_v if n_v else None
 
             # Use averages for main CSV
-            temp_str = f"{temp_avg:.2f}" if temp_avg is not None else '<null>'
-            humid_str = f"{humid_avg:.2f}" if humid_avg is not None else '<null>'
-            volt_str = f"{volt_avg:.2f}" if volt_avg is not None else '<null>'
+            temp_str = _fmt2(temp_avg)
+            humid_str = _fmt2(humid_avg)
+            volt_str = _fmt2(volt_avg)
         else:
             # Single reading - format values
-            temp_str = f"{temp:.2f}" if temp is not None else '<null>'
-            humid_str = f"{humid:.2f}" if humid is not None else '<null>'
-            volt_str = f"{volt:.2f}" if volt is not None else '<null>'
+            temp_str = _fmt2(temp)
+            humid_str = _fmt2(humid)
+            volt_str = _fmt2(volt)
 
-        writer.writerow([
-            timestamp_str, precise_time, packet.device_id, packet.seq_num, 'DATA', is_dup, is_gap,
-            temp_str, humid_str, volt_str
-        ])
-        if self.telemetry_file: self.telemetry_file.flush()
+        self._write_row(timestamp_str, precise_time, packet.device_id, packet.seq_num, 'DATA', is_dup, is_gap,
+                        temp_str, humid_str, volt_str)
 
     def calculate_metrics(self):
         """Calculate all required Phase 2 metrics"""
@@ -695,18 +963,21 @@ class Server:
 
         duration = time.time() - self.start_time
 
+        # One guarded reciprocal instead of a guarded division per metric
+        inv_packets = 1.0 / self.packets_received if self.packets_received > 0 else 0.0
+
         # Calculate bytes per report (average packet size)
-        bytes_per_report = self.total_bytes_received / self.packets_received if self.packets_received > 0 else 0
+        bytes_per_report = self.total_bytes_received * inv_packets
 
         # Calculate duplicate rate as percentage
-        duplicate_rate = (self.duplicate_count / self.packets_received * 100) if self.packets_received > 0 else 0
+        duplicate_rate = self.duplicate_count * inv_packets * 100
 
         # Calculate CPU time per report (average) - use basic timing if psutil not available
-        if self.psutil_available and self.cpu_times:
-            cpu_ms_per_report = sum(self.cpu_times) / len(self.cpu_times)
+        if self.psutil_available and self._cpu_n:
+            cpu_ms_per_report = self._cpu_sum / self._cpu_n
         else:
             # Fallback: estimate CPU time from packet processing
-            cpu_ms_per_report = (duration * 1000) / self.packets_received if self.packets_received > 0 else 0
+            cpu_ms_per_report = duration * 1000 * inv_packets
 
         return {
             'bytes_per_report': bytes_per_report,
@@ -719,6 +990,15 @@ class Server:
             'bytes_per_second': self.total_bytes_received / duration if duration > 0 else 0
         }
 
+    def _compliance_checks(self, metrics):
+        """Build the Phase 2 compliance check list shared by the CSV and console reports"""
+        return [
+            ("Duplicate rate <= 1%", metrics['duplicate_rate'] <= 1.0, "<= 1%"),
+            ("Packets received > 0", metrics['packets_received'] > 0, "> 0"),
+            ("No critical gaps", metrics['sequence_gap_count'] < metrics['packets_received'] * 0.05,
+             "< 5% of packets")
+        ]
+
     def write_metrics_to_csv(self):
         """Append metrics to the end of the CSV file"""
         metrics = self.calculate_metrics()
@@ -760,22 +1040,18 @@ class Server:
             writer.writerow(['=== PER-DEVICE STATISTICS ===', '', '', '', '', '', '', ''])
             writer.writerow(['Device_ID', 'Packets', 'Duplicates', 'Dup_Rate_%', 'Gaps', 'Bytes', '', ''])
 
-            for device_id, state in sorted(self.device_states.items()):
-                device_dup_rate = (state['duplicates'] / state['packets'] * 100) if state['packets'] > 0 else 0
-                writer.writerow([device_id, state['packets'], state['duplicates'],
-                                 f"{device_dup_rate:.1f}", state['gaps'], state['bytes'], '', ''])
+            for device_id in self._sorted_device_ids:
+                state = self.device_states[device_id]
+                device_dup_rate = (state.duplicates / state.packets * 100) if state.packets > 0 else 0
+                writer.writerow([device_id, state.packets, state.duplicates,
+                                 f"{device_dup_rate:.1f}", state.gaps, state.bytes, '', ''])
 
             # Phase 2 compliance
             writer.writerow(['', '', '', '', '', '', '', ''])
             writer.writerow(['=== PHASE 2 COMPLIANCE ===', '', '', '', '', '', '', ''])
             writer.writerow(['Check', 'Status', 'Threshold', '', '', '', '', ''])
 
-            compliance_checks = [
-                ("Duplicate rate <= 1%", metrics['duplicate_rate'] <= 1.0, "<= 1%"),
-                ("Packets received > 0", metrics['packets_received'] > 0, "> 0"),
-                ("No critical gaps", metrics['sequence_gap_count'] < metrics['packets_received'] * 0.05,
-                 "< 5% of packets")
-            ]
+            compliance_checks = self._compliance_checks(metrics)
 
             all_passed = True
             for check_name, passed, threshold in compliance_checks:
@@ -800,51 +1076,51 @@ class Server:
             print("[METRICS] No data collected")
             return
 
-        print("\n" + "=" * 70)
-        print("PHASE 2 METRICS REPORT")
-        print("=" * 70)
+        # Collect the whole report and emit it with a single write instead of
+        # ~20 separate print calls
+        lines = []
+        lines.append("\n" + "=" * 70)
+        lines.append("PHASE 2 METRICS REPORT")
+        lines.append("=" * 70)
 
         # Required Phase 2 metrics
-        print(f"bytes_per_report:     {metrics['bytes_per_report']:.2f} bytes")
-        print(f"packets_received:     {metrics['packets_received']}")
-        print(f"duplicate_rate:       {metrics['duplicate_rate']:.3f}%")
-        print(f"sequence_gap_count:   {metrics['sequence_gap_count']}")
+        lines.append(f"bytes_per_report:     {metrics['bytes_per_report']:.2f} bytes")
+        lines.append(f"packets_received:     {metrics['packets_received']}")
+        lines.append(f"duplicate_rate:       {metrics['duplicate_rate']:.3f}%")
+        lines.append(f"sequence_gap_count:   {metrics['sequence_gap_count']}")
         cpu_note = " (estimated)" if not self.psutil_available else ""
-        print(f"cpu_ms_per_report:    {metrics['cpu_ms_per_report']:.3f} ms{cpu_note}")
+        lines.append(f"cpu_ms_per_report:    {metrics['cpu_ms_per_report']:.3f} ms{cpu_note}")
 
-        print("\nAdditional Performance Metrics:")
-        print(f"Duration:             {metrics['duration_seconds']:.1f} seconds")
-        print(f"Packets per second:   {metrics['packets_per_second']:.1f}")
-        print(f"Bytes per second:     {metrics['bytes_per_second']:.1f}")
-        print(f"Total bytes received: {self.total_bytes_received}")
+        lines.append("\nAdditional Performance Metrics:")
+        lines.append(f"Duration:             {metrics['duration_seconds']:.1f} seconds")
+        lines.append(f"Packets per second:   {metrics['packets_per_second']:.1f}")
+        lines.append(f"Bytes per second:     {metrics['bytes_per_second']:.1f}")
+        lines.append(f"Total bytes received: {self.total_bytes_received}")
 
         # Per-device breakdown
-        print(f"\nPer-Device Statistics:")
+        lines.append("\nPer-Device Statistics:")
         for device_id, state in self.device_states.items():
-            device_dup_rate = (state['duplicates'] / state['packets'] * 100) if state['packets'] > 0 else 0
-            print(f"  Device {device_id}: {state['packets']} packets, "
-                  f"{state['duplicates']} duplicates ({device_dup_rate:.1f}%), "
-                  f"{state['gaps']} gaps, {state['bytes']} bytes")
+            device_dup_rate = (state.duplicates / state.packets * 100) if state.packets > 0 else 0
+            lines.append(f"  Device {device_id}: {state.packets} packets, "
+                         f"{state.duplicates} duplicates ({device_dup_rate:.1f}%), "
+                         f"{state.gaps} gaps, {state.bytes} bytes")
 
         # Phase 2 compliance check
-        print(f"\nPhase 2 Compliance:")
-        compliance_checks = [
-            ("Duplicate rate <= 1%", metrics['duplicate_rate'] <= 1.0),
-            ("Packets received > 0", metrics['packets_received'] > 0),
-            ("No critical gaps", metrics['sequence_gap_count'] < metrics['packets_received'] * 0.05)
-            # Less than 5% gaps
-        ]
+        lines.append("\nPhase 2 Compliance:")
+        compliance_checks = self._compliance_checks(metrics)
 
         all_passed = True
-        for check_name, passed in compliance_checks:
+        for check_name, passed, _threshold in compliance_checks:
             status = "PASS" if passed else "FAIL"
-            print(f"  {check_name}: {status}")
+            lines.append(f"  {check_name}: {status}")
             if not passed:
                 all_passed = False
 
         overall_status = "COMPLIANT" if all_passed else "NON-COMPLIANT"
-        print(f"\nOverall Status: {overall_status}")
-        print("=" * 70)
+        lines.append(f"\nOverall Status: {overall_status}")
+        lines.append("=" * 70)
+
+        sys.stdout.write("\n".join(lines) + "\n")
 
     def finalize_and_save_metrics(self):
         """Write metrics to CSV and print report"""
@@ -865,33 +1141,32 @@ class Server:
 
     def _print_buffer_statistics(self):
         """Print statistics about buffered packets"""
-        total_buffered = 0
-        for device_id, state in self.device_states.items():
-            if 'buffer' in state and state['buffer']:
-                buffered_count = len(state['buffer'])
-                total_buffered += buffered_count
-                print(f"Device {device_id}: {buffered_count} packets still buffered")
-        print(f"Total buffered packets: {total_buffered}")
-
-    def _create_device_state(self):
-        return {
-            'last_seq': -1,
-            'buffer': OrderedDict(),
-            'last_values': None,  # For Data Interpolation
-            'gap_start_time': None,  # For Gap Timeout
-            'last_heartbeat': None,  # For heartbeat tracking
-            'expected_hb_interval': 5.0  # Default heartbeat interval
-        }
-
-    def _print_buffer_statistics(self):
-        """Print statistics about buffered packets"""
-        total_buffered = 0
-        for device_id, state in self.device_states.items():
-            if 'buffer' in state and state['buffer']:
-                buffered_count = len(state['buffer'])
-                total_buffered += buffered_count
-                print(f"Device {device_id}: {buffered_count} packets still buffered")
-        print(f"Total buffered packets: {total_buffered}")
+        # One assembled string and one write instead of a print per device
+        lines = [f"Device {device_id}: {len(state.buffer)} packets still buffered"
+                 for device_id, state in self.device_states.items() if state.buffer]
+        total_buffered = sum(len(state.buffer) for state in self.device_states.values())
+        lines.append(f"Total buffered packets: {total_buffered}\n")
+        sys.stdout.write('\n'.join(lines))
+
+
+def _run_worker(args, worker_id=None):
+    """Run one Server instance; workers get their own CSV suffixed by id"""
+    log_file = args.log_file
+    if worker_id is not None:
+        log_path = Path(log_file)
+        log_file = str(log_path.with_name(f'{log_path.stem}_w{worker_id}.csv'))
+        print(f"[SERVER] Worker {worker_id} logging to: {log_file}")
+
+    # With multiple workers, spread them across consecutive cores starting
+    # at --pin-core
+    pin_core = args.pin_core
+    if pin_core is not None and worker_id is not None:
+        pin_core += worker_id
+
+    server = Server(args.port, log_file, args.max_buffer, args.max_gap_wait, args.auto_shutdown,
+                    rcvbuf_bytes=args.rcvbuf, rx_queue_len=args.rx_queue_len, verbose=args.verbose,
+                    pin_core=pin_core)
+    server.run()
 
 
 if __name__ == '__main__':
@@ -901,10 +1176,36 @@ if __name__ == '__main__':
     parser.add_argument('--max-buffer', type=int, default=1000, help='Max buffer size per device (default: 1000)')
     parser.add_argument('--max-gap-wait', type=int, default=5, help='Max gap wait time in seconds (default: 5)')
     parser.add_argument('--auto-shutdown', type=int, help='Auto-shutdown after N seconds of no packets (optional)')
+    parser.add_argument('--rcvbuf', type=int, default=16 * 1024 * 1024,
+                        help='Requested SO_RCVBUF size in bytes (default: 16 MiB; raise net.core.rmem_max to match)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Worker processes sharing the port via SO_REUSEPORT (default: 1)')
+    parser.add_argument('--rx-queue-len', type=int, default=10000,
+                        help='Bounded receive queue length between socket and processing (default: 10000)')
+    parser.add_argument('--verbose', action='store_true',
+                        help='Print per-packet events (INIT/DATA/HEARTBEAT/BUFFERED/REORDER)')
+    parser.add_argument('--pin-core', type=int,
+                        help='Pin the server to this CPU core (pair with the NIC RX IRQ affinity)')
     args = parser.parse_args()
 
     print(f"[SERVER] Main CSV: {args.log_file}")
-    print(f"[SERVER] Batch details CSV: {args.log_file.replace('.csv', '_batch_details.csv')}")
-
-    server = Server(args.port, args.log_file, args.max_buffer, args.max_gap_wait, args.auto_shutdown)
-    server.run()
\ No newline at end of file
+    _log_path = Path(args.log_file)
+    print(f"[SERVER] Batch details CSV: {_log_path.with_name(_log_path.stem + '_batch_details.csv')}")
+
+    if args.workers > 1:
+        if not hasattr(socket, 'SO_REUSEPORT'):
+            parser.error('--workers requires SO_REUSEPORT support on this platform')
+        import multiprocessing
+
+        workers = [multiprocessing.Process(target=_run_worker, args=(args, i))
+                   for i in range(args.workers)]
+        for worker in workers:
+            worker.start()
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            for worker in workers:
+                worker.terminate()
+    else:
+        _run_worker(args)
\ No newline at end of file
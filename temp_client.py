@@ -4,11 +4,15 @@ Temperature Sensor Client
 Generates only temperature readings with deterministic seed
 """
 import socket
+import struct
 import time
 import random
 import argparse
 import sys
 import os
+import errno
+from array import array
+from collections import deque
 
 # Add Network-ProjectPhase1 to path
 sys.path.append("")
@@ -16,18 +20,138 @@ sys.path.append("")
 from protocol_M_M import (
     VERSION, MSG_INIT, MSG_DATA, MSG_HEARTBEAT, SENSOR_TEMP,
     TelemetryPacket, SensorReading, encode_packet,
-    HEADER_SIZE, READING_SIZE, PAYLOAD_LIMIT, FLAG_BATCHING
+    HEADER_SIZE, READING_SIZE, QUANT_READING_SIZE, PAYLOAD_LIMIT,
+    FLAG_BATCHING, FLAG_QUANT_U8, quantize_value
 )
 
+# Try to import numpy for vectorized reading generation, fallback if not available
+try:
+    import numpy as np
+
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# Try to bind sendmmsg() on Linux so a burst of queued datagrams costs one
+# syscall instead of one sendto() each; other platforms fall back to sendto
+SENDMMSG_AVAILABLE = False
+if sys.platform == 'linux':
+    try:
+        import ctypes
+
+        _libc = ctypes.CDLL(None, use_errno=True)
+        _libc.sendmmsg.restype = ctypes.c_int
+
+        class _Iovec(ctypes.Structure):
+            _fields_ = [('iov_base', ctypes.c_void_p),
+                        ('iov_len', ctypes.c_size_t)]
+
+        class _Msghdr(ctypes.Structure):
+            _fields_ = [('msg_name', ctypes.c_void_p),
+                        ('msg_namelen', ctypes.c_uint),
+                        ('msg_iov', ctypes.POINTER(_Iovec)),
+                        ('msg_iovlen', ctypes.c_size_t),
+                        ('msg_control', ctypes.c_void_p),
+                        ('msg_controllen', ctypes.c_size_t),
+                        ('msg_flags', ctypes.c_int)]
+
+        class _Mmsghdr(ctypes.Structure):
+            _fields_ = [('msg_hdr', _Msghdr),
+                        ('msg_len', ctypes.c_uint)]
+
+        SENDMMSG_AVAILABLE = True
+    except (OSError, AttributeError):
+        SENDMMSG_AVAILABLE = False
+
+
+# Wire-format fragments the specialized encoders below are composed from;
+# must match encode_header/encode_reading in protocol_M_M
+_HEADER_FMT = '!BBBHII'  # version, msg_type, flags, device_id, seq_num, timestamp
+_COUNT_FMT = 'B'         # reading count
+_READING_FMT = 'Bf'      # sensor_type, value
+
+
+def _sendmmsg(sock, datagrams):
+    """Send datagrams on a connected socket, one sendmmsg() per 64 packets.
+
+    Returns the number actually sent; stops early (without raising) when
+    the non-blocking socket's send buffer fills up.
+    """
+    fd = sock.fileno()
+
+    offset = 0
+    while offset < len(datagrams):
+        chunk = datagrams[offset:offset + 64]
+        count = len(chunk)
+        iovecs = (_Iovec * count)()
+        hdrs = (_Mmsghdr * count)()
+        for i, data in enumerate(chunk):
+            iovecs[i].iov_base = ctypes.cast(ctypes.c_char_p(data), ctypes.c_void_p)
+            iovecs[i].iov_len = len(data)
+            hdrs[i].msg_hdr.msg_iov = ctypes.pointer(iovecs[i])
+            hdrs[i].msg_hdr.msg_iovlen = 1
+
+        sent = _libc.sendmmsg(fd, hdrs, count, 0)
+        if sent < 0:
+            err = ctypes.get_errno()
+            if err in (errno.EAGAIN, errno.EWOULDBLOCK):
+                break
+            raise OSError(err, 'sendmmsg failed')
+        offset += sent
+        if sent < count:
+            break
+    return offset
+
 class TemperatureClient:
-    def __init__(self, device_id, host, port, interval, seed=None, heartbeat_interval=10.0, enable_heartbeat=False, period_heartbeat=3.0, enable_batching=False, batching_interval=10.0):
+    def __init__(self, device_id, host, port, interval, seed=None, heartbeat_interval=10.0, enable_heartbeat=False, period_heartbeat=3.0, enable_batching=False, batching_interval=10.0, quantize=False, verbose=False):
         self.device_id = device_id
         self.host = host
         self.port = port
         self.interval = interval
         self.seq = 0
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        # 1 MiB send buffer absorbs sendmmsg bursts that the default
+        # (~212 KB) would drop under load
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 1 << 20)
+        if sys.platform == 'linux':
+            # IP_MTU_DISCOVER=10, IP_PMTUDISC_DO=2 (not exposed by the socket
+            # module): set DF so oversized datagrams fail loudly instead of
+            # silently fragmenting
+            self.sock.setsockopt(socket.IPPROTO_IP, 10, 2)
+        # Non-blocking so a full send buffer re-queues instead of stalling
+        # the send loop; _flush() retries on the next tick
+        self.sock.setblocking(False)
+        # Fixed destination: connect once so each send() skips the per-call
+        # address lookup and tuple allocation that sendto() pays
+        self.sock.connect((host, port))
         self.sensor_type = "TEMPERATURE"
+
+        # Per-packet prints cost a write syscall each; keep them off the
+        # send path unless --verbose is given (startup lines always print)
+        self.verbose = verbose
+
+        # Encoded packets queued for the next _flush(); lets several packets
+        # scheduled in the same tick share one sendmmsg() syscall
+        self._pending = []
+
+        # Quantized mode encodes each reading as sensor_type + uint8 (2 bytes
+        # instead of 5) and marks packets with FLAG_QUANT_U8 for the server
+        self.quantize = quantize
+        self._data_flags = FLAG_QUANT_U8 if quantize else 0
+        self._reading_size = QUANT_READING_SIZE if quantize else READING_SIZE
+        reading_fmt = 'BB' if quantize else _READING_FMT
+
+        # Specialized encoders compiled once for the shapes this client
+        # actually sends: a whole single-reading DATA packet in one Struct
+        # (the normal-mode 99% path), and header+count / per-reading pieces
+        # for variable-length batches
+        self._data_struct = struct.Struct(_HEADER_FMT + _COUNT_FMT + reading_fmt)
+        self._data_buf = bytearray(self._data_struct.size)
+        self._batch_hdr = struct.Struct(_HEADER_FMT + _COUNT_FMT)
+        self._reading_struct = struct.Struct('!' + reading_fmt)
+        # Reusable header/readings buffers for the scatter-gather batch
+        # send; sized once, sliced per batch
+        self._hdr_buf = bytearray(self._batch_hdr.size)
         
         # Heartbeat settings
         self.heartbeat_interval = heartbeat_interval  # Time to wait before starting heartbeats
@@ -39,16 +163,27 @@ class TemperatureClient:
         # Batching settings
         self.enable_batching = enable_batching
         self.batching_interval = batching_interval
-        self.batch_readings = []  # Collect readings for batching
-        self.max_readings_per_packet = (PAYLOAD_LIMIT - HEADER_SIZE - 1) // READING_SIZE  # Calculate from protocol constants
+        # Batch values live in a flat float32 array (all readings are
+        # SENSOR_TEMP, so only the values vary); no SensorReading object per
+        # collected sample and the wire encoding walks a contiguous buffer
+        self.batch_values = array('f')
+        self.max_readings_per_packet = (PAYLOAD_LIMIT - HEADER_SIZE - 1) // self._reading_size  # Calculate from protocol constants
+        self._readings_buf = bytearray(self.max_readings_per_packet * self._reading_size)
         
         # Use deterministic seed for reproducible results
         if seed is not None:
             random.seed(seed)
             print(f"[TEMP CLIENT {device_id}] Random seed set to {seed}")
         else:
-            random.seed(10000 + device_id)  # Default deterministic seed
-            print(f"[TEMP CLIENT {device_id}] Using default seed: {10000 + device_id}")
+            seed = 10000 + device_id  # Default deterministic seed
+            random.seed(seed)
+            print(f"[TEMP CLIENT {device_id}] Using default seed: {seed}")
+
+        # With numpy, readings are drawn 256 at a time from a vectorized RNG
+        # and handed out from a pool, instead of one Mersenne-Twister call
+        # per tick; same seed, still deterministic per environment
+        self._value_pool = deque()
+        self._rng = np.random.default_rng(seed) if NUMPY_AVAILABLE else None
         
         if enable_heartbeat:
             print(f"[TEMP CLIENT {device_id}] Heartbeat enabled: {heartbeat_interval}s idle threshold, {period_heartbeat}s period")
@@ -56,85 +191,171 @@ class TemperatureClient:
         if enable_batching:
             print(f"[TEMP CLIENT {device_id}] Batching enabled: {batching_interval}s batch interval, max {self.max_readings_per_packet} readings/packet")
 
+        if quantize:
+            print(f"[TEMP CLIENT {device_id}] Quantization enabled: uint8 readings ({QUANT_READING_SIZE} bytes each)")
+
     def send_init(self):
         packet = TelemetryPacket(
             VERSION, MSG_INIT, self.device_id,
             self.seq, int(time.time()), [], flags=0
         )
-        self.sock.sendto(encode_packet(packet), (self.host, self.port))
+        self._pending.append(encode_packet(packet))
         print(f"[TEMP CLIENT {self.device_id}] INIT seq={self.seq}")
         self.seq += 1
 
-    def send_heartbeat(self):
+    def send_heartbeat(self, now_i=None):
         """Send heartbeat message to indicate client is alive"""
+        if now_i is None:
+            now_i = int(time.time())
         packet = TelemetryPacket(
             VERSION, MSG_HEARTBEAT, self.device_id,
-            self.seq, int(time.time()), [], flags=0  # Empty readings for heartbeat
+            self.seq, now_i, [], flags=0  # Empty readings for heartbeat
         )
-        self.sock.sendto(encode_packet(packet), (self.host, self.port))
-        print(f"[TEMP CLIENT {self.device_id}] HEARTBEAT seq={self.seq}")
+        self._pending.append(encode_packet(packet))
+        if self.verbose:
+            print(f"[TEMP CLIENT {self.device_id}] HEARTBEAT seq={self.seq}")
         self.seq += 1
-        self.last_heartbeat_time = time.time()
+        self.last_heartbeat_time = time.monotonic()
+
+    def _flush(self):
+        """Send queued datagrams, batching via sendmmsg() on Linux.
+
+        Anything the kernel refuses with EAGAIN stays in _pending and is
+        retried on the next flush.
+        """
+        if not self._pending:
+            return
+        if SENDMMSG_AVAILABLE and len(self._pending) > 1:
+            try:
+                sent = _sendmmsg(self.sock, self._pending)
+                del self._pending[:sent]
+                return
+            except ConnectionRefusedError:
+                # ICMP port-unreachable: no server listening right now. UDP
+                # telemetry is fire-and-forget, so drop the burst and carry on
+                self._pending.clear()
+                return
+            except OSError:
+                pass  # fall back to plain send below
+        sent = 0
+        try:
+            for data in self._pending:
+                self.sock.send(data)
+                sent += 1
+        except BlockingIOError:
+            pass  # send buffer full; keep the remainder queued
+        except ConnectionRefusedError:
+            sent = len(self._pending)  # no server listening; drop the burst
+        del self._pending[:sent]
+
+    def _next_temp(self):
+        """Draw the next temperature value, refilling the pool in bulk"""
+        if self._rng is not None:
+            if not self._value_pool:
+                self._value_pool.extend(self._rng.uniform(20.0, 30.0, size=256).tolist())
+            return self._value_pool.popleft()
+        return random.uniform(20.0, 30.0)
 
     def generate_temperature_reading(self):
         """Generate a single temperature reading"""
-        temp_value = random.uniform(20.0, 30.0)
-        return SensorReading(SENSOR_TEMP, temp_value)
+        return SensorReading(SENSOR_TEMP, self._next_temp())
 
-    def send_temperature_data(self):
+    def send_temperature_data(self, now_i=None):
         """Send single temperature reading (normal mode)"""
-        reading = self.generate_temperature_reading()
-        readings = [reading]
+        if now_i is None:
+            now_i = int(time.time())
+        temp_value = self._next_temp()
 
-        packet = TelemetryPacket(
-            VERSION, MSG_DATA, self.device_id,
-            self.seq, int(time.time()), readings, flags=0
-        )
-        self.sock.sendto(encode_packet(packet), (self.host, self.port))
-        print(f"[TEMP CLIENT {self.device_id}] DATA seq={self.seq}, temp={reading.value:.2f}°C")
+        # Fast path: pack header + reading count + reading in one call,
+        # skipping the TelemetryPacket/SensorReading objects entirely
+        wire_value = quantize_value(SENSOR_TEMP, temp_value) if self.quantize else temp_value
+        self._data_struct.pack_into(self._data_buf, 0,
+                                    VERSION, MSG_DATA, self._data_flags, self.device_id,
+                                    self.seq, now_i,
+                                    1, SENSOR_TEMP, wire_value)
+        self._pending.append(bytes(self._data_buf))
+        if self.verbose:
+            print(f"[TEMP CLIENT {self.device_id}] DATA seq={self.seq}, temp={temp_value:.2f}°C")
         self.seq += 1
-        self.last_data_time = time.time()
+        self.last_data_time = time.monotonic()
 
     def add_reading_to_batch(self):
         """Add a reading to the current batch"""
-        reading = self.generate_temperature_reading()
-        self.batch_readings.append(reading)
-        print(f"[TEMP CLIENT {self.device_id}] Added to batch: temp={reading.value:.2f}°C (batch size: {len(self.batch_readings)})")
-        
+        value = self._next_temp()
+        self.batch_values.append(value)
+        if self.verbose:
+            print(f"[TEMP CLIENT {self.device_id}] Added to batch: temp={value:.2f}°C (batch size: {len(self.batch_values)})")
+
         # Check if batch is full
-        if len(self.batch_readings) >= self.max_readings_per_packet:
+        if len(self.batch_values) >= self.max_readings_per_packet:
             print(f"[TEMP CLIENT {self.device_id}] Batch full ({self.max_readings_per_packet} readings), sending early")
             self.send_batch()
 
-    def send_batch(self):
+    def send_batch(self, now_i=None):
         """Send all readings in the current batch"""
-        if not self.batch_readings:
+        values = self.batch_values
+        if not values:
             return
-        
-        packet = TelemetryPacket(
-            VERSION, MSG_DATA, self.device_id,
-            self.seq, int(time.time()), self.batch_readings.copy(), flags=FLAG_BATCHING
-        )
-        self.sock.sendto(encode_packet(packet), (self.host, self.port))
-        
-        # Log batch details
-        temp_values = [r.value for r in self.batch_readings]
-        avg_temp = sum(temp_values) / len(temp_values)
-        min_temp = min(temp_values)
-        max_temp = max(temp_values)
-        
-        print(f"[TEMP CLIENT {self.device_id}] BATCH seq={self.seq}, {len(self.batch_readings)} readings, "
-              f"temp avg={avg_temp:.2f}°C (min={min_temp:.2f}, max={max_temp:.2f})")
-        
+        if now_i is None:
+            now_i = int(time.time())
+
+        # Encode straight from the value array into the reusable header and
+        # readings buffers, then hand both to sendmsg() as an iovec pair so
+        # the kernel gathers them -- no intermediate contiguous packet copy
+        count = len(values)
+        reading_size = self._reading_size
+        self._batch_hdr.pack_into(self._hdr_buf, 0, VERSION, MSG_DATA, FLAG_BATCHING | self._data_flags,
+                                  self.device_id, self.seq, now_i, count)
+        readings_buf = self._readings_buf
+        pack_reading = self._reading_struct.pack_into
+        offset = 0
+        if self.quantize:
+            for value in values:
+                pack_reading(readings_buf, offset, SENSOR_TEMP, quantize_value(SENSOR_TEMP, value))
+                offset += reading_size
+        else:
+            for value in values:
+                pack_reading(readings_buf, offset, SENSOR_TEMP, value)
+                offset += reading_size
+        readings_mv = memoryview(readings_buf)[:offset]
+        try:
+            self.sock.sendmsg([memoryview(self._hdr_buf), readings_mv])
+        except BlockingIOError:
+            # Send buffer full: queue a contiguous copy for the next flush
+            self._pending.append(bytes(self._hdr_buf) + bytes(readings_mv))
+        except ConnectionRefusedError:
+            pass  # no server listening; drop the batch, fire-and-forget
+
+        # Log batch details; with numpy the stats come from one C pass over
+        # the contiguous values instead of three Python loops. np.array (not
+        # asarray): a zero-copy view would still export the array's buffer
+        # when the clear below resizes it, raising BufferError
+        if NUMPY_AVAILABLE:
+            vals = np.array(values)
+            avg_temp = float(vals.mean())
+            min_temp = float(vals.min())
+            max_temp = float(vals.max())
+        else:
+            avg_temp = sum(values) / count
+            min_temp = min(values)
+            max_temp = max(values)
+
+        if self.verbose:
+            print(f"[TEMP CLIENT {self.device_id}] BATCH seq={self.seq}, {count} readings, "
+                  f"temp avg={avg_temp:.2f}°C (min={min_temp:.2f}, max={max_temp:.2f})")
+
         self.seq += 1
-        self.last_data_time = time.time()
-        self.batch_readings.clear()  # Clear batch after sending
+        self.last_data_time = time.monotonic()
+        del values[:]  # Clear batch after sending
 
     def run(self, duration):
         print(f"[TEMP CLIENT {self.device_id}] Starting temperature sensor for {duration}s")
         self.send_init()
-        
-        start_time = time.time()
+        self._flush()  # INIT goes out immediately so the server sees us first
+
+        # All scheduling runs on the monotonic clock so wall-clock jumps
+        # (NTP steps, DST) cannot stall or burst the send timers
+        start_time = time.monotonic()
         end_time = start_time + duration
         self.last_data_time = start_time
         self.last_heartbeat_time = start_time
@@ -147,41 +368,53 @@ class TemperatureClient:
             next_heartbeat_time = start_time + self.heartbeat_interval  # Schedule first potential heartbeat
             
             try:
-                while time.time() < end_time:
-                    current_time = time.time()
-                    
+                while True:
+                    current_time = time.monotonic()
+                    if current_time >= end_time:
+                        break
+                    # One wall-clock read per tick; every packet sent this
+                    # tick shares the same whole-second timestamp
+                    now_i = int(time.time())
+
                     # Priority 1: Send BATCH if it's time (highest priority)
                     if current_time >= next_batch_send_time:
-                        self.send_batch()  # Send whatever is in the batch (even if empty)
+                        self.send_batch(now_i)  # Send whatever is in the batch (even if empty)
                         next_batch_send_time = current_time + self.batching_interval  # Schedule next batch
                         # Reset heartbeat timing when batch is sent
                         next_heartbeat_time = current_time + self.heartbeat_interval
-                        
+
                     # Priority 2: Collect reading if it's time
                     elif current_time >= next_reading_time:
                         self.add_reading_to_batch()
                         next_reading_time = current_time + self.interval  # Schedule next reading
-                        
+
                     # Priority 3: Send HEARTBEAT if enabled, idle long enough, and time for heartbeat
-                    elif (self.enable_heartbeat and 
+                    elif (self.enable_heartbeat and
                           current_time >= next_heartbeat_time and
                           (current_time - self.last_data_time) >= self.heartbeat_interval):
-                        self.send_heartbeat()
+                        self.send_heartbeat(now_i)
                         next_heartbeat_time = current_time + self.period_heartbeat  # Schedule next heartbeat
-                    
-                    # Small sleep to prevent busy waiting
-                    time.sleep(0.1)
-                    
+
+                    # Flush whatever this tick queued, then sleep exactly
+                    # until the earliest upcoming deadline (no 100ms polling)
+                    self._flush()
+                    next_deadline = min(next_batch_send_time, next_reading_time, end_time)
+                    if self.enable_heartbeat:
+                        next_deadline = min(next_deadline, next_heartbeat_time)
+                    delay = next_deadline - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+
                 # Send any remaining readings in batch before exit
-                if self.batch_readings:
-                    print(f"[TEMP CLIENT {self.device_id}] Sending final batch with {len(self.batch_readings)} readings")
+                if self.batch_values:
+                    print(f"[TEMP CLIENT {self.device_id}] Sending final batch with {len(self.batch_values)} readings")
                     self.send_batch()
                     
             except KeyboardInterrupt:
                 print(f"\n[TEMP CLIENT {self.device_id}] Stopping...")
                 # Send any remaining readings in batch
-                if self.batch_readings:
-                    print(f"[TEMP CLIENT {self.device_id}] Sending final batch with {len(self.batch_readings)} readings")
+                if self.batch_values:
+                    print(f"[TEMP CLIENT {self.device_id}] Sending final batch with {len(self.batch_values)} readings")
                     self.send_batch()
         else:
             # NORMAL MODE (existing logic)
@@ -190,29 +423,42 @@ class TemperatureClient:
             next_heartbeat_time = start_time + self.heartbeat_interval  # Schedule first potential heartbeat
             
             try:
-                while time.time() < end_time:
-                    current_time = time.time()
-                    
+                while True:
+                    current_time = time.monotonic()
+                    if current_time >= end_time:
+                        break
+                    # One wall-clock read per tick; every packet sent this
+                    # tick shares the same whole-second timestamp
+                    now_i = int(time.time())
+
                     # Priority 1: Send DATA if it's time (DATA has highest priority)
                     if current_time >= next_data_time:
-                        self.send_temperature_data()
+                        self.send_temperature_data(now_i)
                         next_data_time = current_time + self.interval  # Schedule next data
                         # Reset heartbeat timing when data is sent
                         next_heartbeat_time = current_time + self.heartbeat_interval
-                        
+
                     # Priority 2: Send HEARTBEAT if enabled, idle long enough, and time for heartbeat
-                    elif (self.enable_heartbeat and 
+                    elif (self.enable_heartbeat and
                           current_time >= next_heartbeat_time and
                           (current_time - self.last_data_time) >= self.heartbeat_interval):
-                        self.send_heartbeat()
+                        self.send_heartbeat(now_i)
                         next_heartbeat_time = current_time + self.period_heartbeat  # Schedule next heartbeat
-                    
-                    # Small sleep to prevent busy waiting
-                    time.sleep(0.1)
-                    
+
+                    # Flush whatever this tick queued, then sleep exactly
+                    # until the earliest upcoming deadline (no 100ms polling)
+                    self._flush()
+                    next_deadline = min(next_data_time, end_time)
+                    if self.enable_heartbeat:
+                        next_deadline = min(next_deadline, next_heartbeat_time)
+                    delay = next_deadline - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+
             except KeyboardInterrupt:
                 print(f"\n[TEMP CLIENT {self.device_id}] Stopping...")
         
+        self._flush()  # Drain anything queued by a final batch or interrupt
         self.sock.close()
         print(f"[TEMP CLIENT {self.device_id}] Socket closed")
 
@@ -229,9 +475,11 @@ if __name__ == "__main__":
     parser.add_argument("--enable-heartbeat", action="store_true", help="Enable heartbeat functionality")
     parser.add_argument("--enable-batching", action="store_true", help="Enable batching mode (collect multiple readings per packet)")
     parser.add_argument("--batching-interval", type=float, default=10.0, help="Interval between batch sends (default: 10.0s)")
+    parser.add_argument("--quantize", action="store_true", help="Send uint8-quantized readings (2 bytes/reading instead of 5)")
+    parser.add_argument("--verbose", action="store_true", help="Print per-packet events (DATA/HEARTBEAT/BATCH)")
     args = parser.parse_args()
 
-    client = TemperatureClient(args.device_id, args.server_host, args.server_port, args.interval, args.seed, 
+    client = TemperatureClient(args.device_id, args.server_host, args.server_port, args.interval, args.seed,
                               args.heartbeat_interval, args.enable_heartbeat, args.period_heartbeat,
-                              args.enable_batching, args.batching_interval)
+                              args.enable_batching, args.batching_interval, args.quantize, args.verbose)
     client.run(args.duration)
\ No newline at end of file
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Shared UDP Sender
+One socket + one sender thread for all sensor clients colocated in a process
+"""
+import socket
+import sys
+import threading
+import queue
+
+# Try to bind sendmmsg() on Linux so a drained burst of queued datagrams
+# costs one syscall instead of one send() each; other platforms fall back
+SENDMMSG_AVAILABLE = False
+if sys.platform == 'linux':
+    try:
+        import ctypes
+
+        _libc = ctypes.CDLL(None, use_errno=True)
+        _libc.sendmmsg.restype = ctypes.c_int
+
+        class _Iovec(ctypes.Structure):
+            _fields_ = [('iov_base', ctypes.c_void_p),
+                        ('iov_len', ctypes.c_size_t)]
+
+        class _Msghdr(ctypes.Structure):
+            _fields_ = [('msg_name', ctypes.c_void_p),
+                        ('msg_namelen', ctypes.c_uint),
+                        ('msg_iov', ctypes.POINTER(_Iovec)),
+                        ('msg_iovlen', ctypes.c_size_t),
+                        ('msg_control', ctypes.c_void_p),
+                        ('msg_controllen', ctypes.c_size_t),
+                        ('msg_flags', ctypes.c_int)]
+
+        class _Mmsghdr(ctypes.Structure):
+            _fields_ = [('msg_hdr', _Msghdr),
+                        ('msg_len', ctypes.c_uint)]
+
+        SENDMMSG_AVAILABLE = True
+    except (OSError, AttributeError):
+        SENDMMSG_AVAILABLE = False
+
+
+def _sendmmsg(sock, datagrams):
+    """Send datagrams on a connected socket, one sendmmsg() per 64 packets"""
+    fd = sock.fileno()
+
+    offset = 0
+    while offset < len(datagrams):
+        chunk = datagrams[offset:offset + 64]
+        count = len(chunk)
+        iovecs = (_Iovec * count)()
+        hdrs = (_Mmsghdr * count)()
+        for i, data in enumerate(chunk):
+            iovecs[i].iov_base = ctypes.cast(ctypes.c_char_p(data), ctypes.c_void_p)
+            iovecs[i].iov_len = len(data)
+            hdrs[i].msg_hdr.msg_iov = ctypes.pointer(iovecs[i])
+            hdrs[i].msg_hdr.msg_iovlen = 1
+
+        sent = _libc.sendmmsg(fd, hdrs, count, 0)
+        if sent < 0:
+            raise OSError(ctypes.get_errno(), 'sendmmsg failed')
+        offset += sent
+
+
+class UdpSender:
+    """Process-wide sender: clients enqueue encoded datagrams, one daemon
+    thread drains the queue and ships each burst with a single sendmmsg().
+
+    Lets several colocated sensor clients share one socket and one syscall
+    budget instead of each paying per-datagram sends. Clients that run as
+    their own process (the sensor_launcher default) keep their in-process
+    flush path; this class is for embedding multiple clients in one process.
+    """
+
+    # One send per datagram is pointless; drain up to this many queued
+    # datagrams into each sendmmsg burst
+    MAX_BURST = 64
+
+    def __init__(self, host, port, sndbuf_bytes=1 << 20):
+        self.q = queue.SimpleQueue()
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, sndbuf_bytes)
+        self.sock.connect((host, port))
+        self._thread = threading.Thread(target=self._drain, daemon=True)
+        self._thread.start()
+
+    def send(self, data):
+        """Queue one encoded datagram for the sender thread"""
+        self.q.put(data)
+
+    def _drain(self):
+        while True:
+            burst = [self.q.get()]  # block until something arrives
+            if burst[0] is None:
+                break
+            # Sweep whatever else queued up while we slept into one burst
+            try:
+                while len(burst) < self.MAX_BURST:
+                    data = self.q.get_nowait()
+                    if data is None:
+                        self._send_burst(burst)
+                        return
+                    burst.append(data)
+            except queue.Empty:
+                pass
+            self._send_burst(burst)
+
+    def _send_burst(self, burst):
+        if SENDMMSG_AVAILABLE and len(burst) > 1:
+            try:
+                _sendmmsg(self.sock, burst)
+                return
+            except OSError:
+                pass  # fall back to plain send below
+        for data in burst:
+            self.sock.send(data)
+
+    def close(self):
+        """Flush remaining datagrams, stop the sender thread, close the socket"""
+        self.q.put(None)
+        self._thread.join()
+        self.sock.close()
@@ -4,30 +4,148 @@ Voltage Sensor Client
 Generates only voltage readings with deterministic seed
 """
 import socket
+import struct
 import time
 import random
 import argparse
 import sys
 import os
+from array import array
+from collections import deque
 
 # Add Network-ProjectPhase1 to path
 sys.path.append("")
 
 from protocol_M_M import (
     VERSION, MSG_INIT, MSG_DATA, MSG_HEARTBEAT, SENSOR_VOLT,
-    TelemetryPacket, SensorReading, encode_packet,
+    TelemetryPacket, SensorReading, encode_packet, encode_packet_into,
     HEADER_SIZE, READING_SIZE, PAYLOAD_LIMIT, FLAG_BATCHING
 )
 
+# Try to import numpy for vectorized reading generation, fallback if not available
+try:
+    import numpy as np
+
+    NUMPY_AVAILABLE = True
+    # Wire layout of one batched reading: sensor_type byte + big-endian
+    # float32, so a whole batch encodes as one structured-array tobytes()
+    _READING_DTYPE = np.dtype([('sensor_type', 'u1'), ('value', '>f4')])
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# Try to bind sendmmsg() on Linux so a burst of queued datagrams costs one
+# syscall instead of one sendto() each; other platforms fall back to sendto
+SENDMMSG_AVAILABLE = False
+if sys.platform == 'linux':
+    try:
+        import ctypes
+
+        _libc = ctypes.CDLL(None, use_errno=True)
+        _libc.sendmmsg.restype = ctypes.c_int
+
+        class _Iovec(ctypes.Structure):
+            _fields_ = [('iov_base', ctypes.c_void_p),
+                        ('iov_len', ctypes.c_size_t)]
+
+        class _Msghdr(ctypes.Structure):
+            _fields_ = [('msg_name', ctypes.c_void_p),
+                        ('msg_namelen', ctypes.c_uint),
+                        ('msg_iov', ctypes.POINTER(_Iovec)),
+                        ('msg_iovlen', ctypes.c_size_t),
+                        ('msg_control', ctypes.c_void_p),
+                        ('msg_controllen', ctypes.c_size_t),
+                        ('msg_flags', ctypes.c_int)]
+
+        class _Mmsghdr(ctypes.Structure):
+            _fields_ = [('msg_hdr', _Msghdr),
+                        ('msg_len', ctypes.c_uint)]
+
+        SENDMMSG_AVAILABLE = True
+    except (OSError, AttributeError):
+        SENDMMSG_AVAILABLE = False
+
+
+# Linux >=4.18 UDP generic segmentation offload: one sendmsg() can carry
+# several equal-size datagrams that the kernel slices back apart. The
+# socket module does not expose these constants.
+_SOL_UDP = 17
+_UDP_SEGMENT = 103
+
+
+def _send_gso(sock, datagrams):
+    """Send datagrams of one size (last may be shorter) as a GSO super-buffer"""
+    seg_size = len(datagrams[0])
+    sock.sendmsg([b''.join(datagrams)],
+                 [(_SOL_UDP, _UDP_SEGMENT, struct.pack('H', seg_size))])
+
+
+def _sendmmsg(sock, datagrams):
+    """Send datagrams on a connected socket, one sendmmsg() per 64 packets"""
+    fd = sock.fileno()
+
+    offset = 0
+    while offset < len(datagrams):
+        chunk = datagrams[offset:offset + 64]
+        count = len(chunk)
+        iovecs = (_Iovec * count)()
+        hdrs = (_Mmsghdr * count)()
+        for i, data in enumerate(chunk):
+            iovecs[i].iov_base = ctypes.cast(ctypes.c_char_p(data), ctypes.c_void_p)
+            iovecs[i].iov_len = len(data)
+            hdrs[i].msg_hdr.msg_iov = ctypes.pointer(iovecs[i])
+            hdrs[i].msg_hdr.msg_iovlen = 1
+
+        sent = _libc.sendmmsg(fd, hdrs, count, 0)
+        if sent < 0:
+            raise OSError(ctypes.get_errno(), 'sendmmsg failed')
+        offset += sent
+
 class VoltageClient:
-    def __init__(self, device_id, host, port, interval, seed=None, heartbeat_interval=10.0, enable_heartbeat=False, period_heartbeat=3.0, enable_batching=False, batching_interval=10.0):
+    def __init__(self, device_id, host, port, interval, seed=None, heartbeat_interval=10.0, enable_heartbeat=False, period_heartbeat=3.0, enable_batching=False, batching_interval=10.0, verbose=False, mtu=None):
         self.device_id = device_id
         self.host = host
         self.port = port
         self.interval = interval
         self.seq = 0
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        # 1 MiB send buffer absorbs sendmmsg bursts that the default
+        # (~212 KB) would drop under load
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 1 << 20)
+        if sys.platform == 'linux':
+            # IP_MTU_DISCOVER=10, IP_PMTUDISC_DO=2 (not exposed by the socket
+            # module): set DF so oversized datagrams fail loudly instead of
+            # silently fragmenting
+            self.sock.setsockopt(socket.IPPROTO_IP, 10, 2)
+        # Fixed destination: connect once so each send() skips the per-call
+        # address lookup and tuple allocation that sendto() pays
+        self.sock.connect((host, port))
         self.sensor_type = "VOLTAGE"
+
+        # GSO lets one sendmsg() ship a run of equal-size datagrams; cleared
+        # on first failure so unsupported kernels fall back to sendmmsg
+        self._gso_ok = sys.platform == 'linux'
+
+        # Per-packet prints cost a write syscall each; keep them off the
+        # send path unless --verbose is given (startup lines always print)
+        self.verbose = verbose
+
+        # Encoded packets queued for the next _flush(); lets several packets
+        # scheduled in the same tick share one sendmmsg() syscall
+        self._pending = []
+
+        # Single-reading DATA packets have a fixed 19-byte shape
+        # (header + count + one reading); one precompiled Struct packed into
+        # a reusable buffer replaces encode_packet's per-tick object churn
+        self._data_struct = struct.Struct('!BBBHIIBBf')
+        self._data_buf = bytearray(self._data_struct.size)
+        self._batch_hdr = struct.Struct('!BBBHIIB')
+        self._reading_struct = struct.Struct('!Bf')
+        # One payload-sized scratch buffer shared by every encode; the only
+        # per-send allocation left is the immutable snapshot queued for flush
+        self._sendbuf = bytearray(PAYLOAD_LIMIT)
+        # Reusable header/readings buffers for the scatter-gather batch
+        # send; sized once, sliced per batch
+        self._hdr_buf = bytearray(self._batch_hdr.size)
         
         # Heartbeat settings
         self.heartbeat_interval = heartbeat_interval  # Time to wait before starting heartbeats
@@ -39,16 +157,38 @@ class VoltageClient:
         # Batching settings
         self.enable_batching = enable_batching
         self.batching_interval = batching_interval
-        self.batch_readings = []  # Collect readings for batching
-        self.max_readings_per_packet = (PAYLOAD_LIMIT - HEADER_SIZE - 1) // READING_SIZE  # Calculate from protocol constants
+        # Batch values live in a flat float32 array (all readings are
+        # SENSOR_VOLT, so only the values vary); no SensorReading object per
+        # collected sample and the wire encoding walks a contiguous buffer
+        self.batch_values = array('f')
+        # Size batches toward the link MTU when given, but the protocol's
+        # PAYLOAD_LIMIT stays the hard ceiling: the decoder rejects batched
+        # packets larger than that, whatever the path supports
+        payload_limit = PAYLOAD_LIMIT
+        if mtu is not None:
+            payload_limit = min(mtu - 28, PAYLOAD_LIMIT)  # 20B IP + 8B UDP headers
+        self.max_readings_per_packet = (payload_limit - HEADER_SIZE - 1) // READING_SIZE  # Calculate from protocol constants
+        self._readings_buf = bytearray(self.max_readings_per_packet * READING_SIZE)
+        if NUMPY_AVAILABLE:
+            # Structured view over the readings buffer, built once;
+            # send_batch slices it per batch instead of re-wrapping the
+            # buffer on every send
+            self._recs = np.frombuffer(self._readings_buf, dtype=_READING_DTYPE)
         
         # Use deterministic seed for reproducible results
         if seed is not None:
             random.seed(seed)
             print(f"[VOLT CLIENT {device_id}] Random seed set to {seed}")
         else:
-            random.seed(30000 + device_id)  # Default deterministic seed
-            print(f"[VOLT CLIENT {device_id}] Using default seed: {30000 + device_id}")
+            seed = 30000 + device_id  # Default deterministic seed
+            random.seed(seed)
+            print(f"[VOLT CLIENT {device_id}] Using default seed: {seed}")
+
+        # With numpy, readings are drawn 256 at a time from a vectorized RNG
+        # and handed out from a pool, instead of one Mersenne-Twister call
+        # per tick; same seed, still deterministic per environment
+        self._value_pool = deque()
+        self._rng = np.random.default_rng(seed) if NUMPY_AVAILABLE else None
         
         if enable_heartbeat:
             print(f"[VOLT CLIENT {device_id}] Heartbeat enabled: {heartbeat_interval}s idle threshold, {period_heartbeat}s period")
@@ -56,85 +196,176 @@ class VoltageClient:
         if enable_batching:
             print(f"[VOLT CLIENT {device_id}] Batching enabled: {batching_interval}s batch interval, max {self.max_readings_per_packet} readings/packet")
 
+        if mtu is not None and sys.platform == 'linux':
+            path_mtu = self.sock.getsockopt(socket.IPPROTO_IP, 14)  # IP_MTU, connected sockets only
+            print(f"[VOLT CLIENT {device_id}] Requested MTU {mtu}, path MTU {path_mtu}, payload limit {payload_limit} bytes")
+
     def send_init(self):
         packet = TelemetryPacket(
             VERSION, MSG_INIT, self.device_id,
             self.seq, int(time.time()), [], flags=0
         )
-        self.sock.sendto(encode_packet(packet), (self.host, self.port))
+        n = encode_packet_into(self._sendbuf, packet)
+        self._pending.append(bytes(self._sendbuf[:n]))
         print(f"[VOLT CLIENT {self.device_id}] INIT seq={self.seq}")
         self.seq += 1
 
-    def send_heartbeat(self):
+    def send_heartbeat(self, now_i=None):
         """Send heartbeat message to indicate client is alive"""
+        if now_i is None:
+            now_i = int(time.time())
         packet = TelemetryPacket(
             VERSION, MSG_HEARTBEAT, self.device_id,
-            self.seq, int(time.time()), [], flags=0  # Empty readings for heartbeat
+            self.seq, now_i, [], flags=0  # Empty readings for heartbeat
         )
-        self.sock.sendto(encode_packet(packet), (self.host, self.port))
-        print(f"[VOLT CLIENT {self.device_id}] HEARTBEAT seq={self.seq}")
+        n = encode_packet_into(self._sendbuf, packet)
+        self._pending.append(bytes(self._sendbuf[:n]))
+        if self.verbose:
+            print(f"[VOLT CLIENT {self.device_id}] HEARTBEAT seq={self.seq}")
         self.seq += 1
-        self.last_heartbeat_time = time.time()
+        self.last_heartbeat_time = time.monotonic()
+
+    def _next_volt(self):
+        """Draw the next voltage value, refilling the pool in bulk"""
+        if self._rng is not None:
+            if not self._value_pool:
+                self._value_pool.extend(self._rng.uniform(3.0, 5.5, size=256).tolist())
+            return self._value_pool.popleft()
+        return random.uniform(3.0, 5.5)
 
     def generate_voltage_reading(self):
         """Generate a single voltage reading"""
-        volt_value = random.uniform(3.0, 5.5)
-        return SensorReading(SENSOR_VOLT, volt_value)
+        return SensorReading(SENSOR_VOLT, self._next_volt())
 
-    def send_voltage_data(self):
+    def send_voltage_data(self, now_i=None):
         """Send single voltage reading (normal mode)"""
-        reading = self.generate_voltage_reading()
-        readings = [reading]
+        if now_i is None:
+            now_i = int(time.time())
+        volt_value = self._next_volt()
 
-        packet = TelemetryPacket(
-            VERSION, MSG_DATA, self.device_id,
-            self.seq, int(time.time()), readings, flags=0
-        )
-        self.sock.sendto(encode_packet(packet), (self.host, self.port))
-        print(f"[VOLT CLIENT {self.device_id}] DATA seq={self.seq}, voltage={reading.value:.2f}V")
+        # Fast path: pack header + reading count + reading in one call,
+        # skipping the TelemetryPacket/SensorReading objects entirely
+        self._data_struct.pack_into(self._data_buf, 0,
+                                    VERSION, MSG_DATA, 0, self.device_id,
+                                    self.seq, now_i,
+                                    1, SENSOR_VOLT, volt_value)
+        self._pending.append(bytes(self._data_buf))
+        if self.verbose:
+            print(f"[VOLT CLIENT {self.device_id}] DATA seq={self.seq}, voltage={volt_value:.2f}V")
         self.seq += 1
-        self.last_data_time = time.time()
+        self.last_data_time = time.monotonic()
 
     def add_reading_to_batch(self):
         """Add a reading to the current batch"""
-        reading = self.generate_voltage_reading()
-        self.batch_readings.append(reading)
-        print(f"[VOLT CLIENT {self.device_id}] Added to batch: voltage={reading.value:.2f}V (batch size: {len(self.batch_readings)})")
+        value = self._next_volt()
+        self.batch_values.append(value)
+        if self.verbose:
+            print(f"[VOLT CLIENT {self.device_id}] Added to batch: voltage={value:.2f}V (batch size: {len(self.batch_values)})")
         
         # Check if batch is full
-        if len(self.batch_readings) >= self.max_readings_per_packet:
+        if len(self.batch_values) >= self.max_readings_per_packet:
             print(f"[VOLT CLIENT {self.device_id}] Batch full ({self.max_readings_per_packet} readings), sending early")
             self.send_batch()
 
-    def send_batch(self):
+    def _flush(self):
+        """Send all queued datagrams, batching via sendmmsg() on Linux"""
+        if not self._pending:
+            return
+        if self._gso_ok and len(self._pending) > 1:
+            # All queued datagrams but the last must share one size (true for
+            # runs of 19-byte DATA packets); the kernel splits the rest
+            seg_size = len(self._pending[0])
+            if (all(len(d) == seg_size for d in self._pending[:-1])
+                    and len(self._pending[-1]) <= seg_size):
+                try:
+                    _send_gso(self.sock, self._pending)
+                    self._pending.clear()
+                    return
+                except ConnectionRefusedError:
+                    # ICMP port-unreachable: no server listening right now.
+                    # UDP telemetry is fire-and-forget -- drop the burst
+                    # (and keep GSO; the kernel does support it)
+                    self._pending.clear()
+                    return
+                except OSError:
+                    self._gso_ok = False  # kernel without UDP_SEGMENT
+        try:
+            if SENDMMSG_AVAILABLE and len(self._pending) > 1:
+                try:
+                    _sendmmsg(self.sock, self._pending)
+                except ConnectionRefusedError:
+                    raise
+                except OSError:
+                    for data in self._pending:
+                        self.sock.send(data)
+            else:
+                for data in self._pending:
+                    self.sock.send(data)
+        except ConnectionRefusedError:
+            pass  # no server listening; drop the burst, fire-and-forget
+        self._pending.clear()
+
+    def send_batch(self, now_i=None):
         """Send all readings in the current batch"""
-        if not self.batch_readings:
+        values = self.batch_values
+        if not values:
             return
-        
-        packet = TelemetryPacket(
-            VERSION, MSG_DATA, self.device_id,
-            self.seq, int(time.time()), self.batch_readings.copy(), flags=FLAG_BATCHING
-        )
-        self.sock.sendto(encode_packet(packet), (self.host, self.port))
-        
-        # Log batch details
-        volt_values = [r.value for r in self.batch_readings]
-        avg_volt = sum(volt_values) / len(volt_values)
-        min_volt = min(volt_values)
-        max_volt = max(volt_values)
-        
-        print(f"[VOLT CLIENT {self.device_id}] BATCH seq={self.seq}, {len(self.batch_readings)} readings, "
-              f"voltage avg={avg_volt:.2f}V (min={min_volt:.2f}, max={max_volt:.2f})")
+        if now_i is None:
+            now_i = int(time.time())
+
+        # Encode straight from the value array into the reusable header and
+        # readings buffers, then hand both to sendmsg() as an iovec pair so
+        # the kernel gathers them -- no intermediate contiguous packet copy
+        count = len(values)
+        self._batch_hdr.pack_into(self._hdr_buf, 0, VERSION, MSG_DATA, FLAG_BATCHING,
+                                  self.device_id, self.seq, now_i, count)
+        readings_buf = self._readings_buf
+        if NUMPY_AVAILABLE:
+            # Encode and compute stats in C passes: the precomputed
+            # structured view over the readings buffer is filled in place,
+            # vectorized mean/min/max share the float view (whose buffer
+            # export is released when the batch array is swapped out below)
+            vals = np.frombuffer(values, dtype='f4')
+            recs = self._recs[:count]
+            recs['sensor_type'] = SENSOR_VOLT
+            recs['value'] = vals
+            avg_volt = float(vals.mean())
+            min_volt = float(vals.min())
+            max_volt = float(vals.max())
+        else:
+            pack_reading = self._reading_struct.pack_into
+            pos = 0
+            for value in values:
+                pack_reading(readings_buf, pos, SENSOR_VOLT, value)
+                pos += READING_SIZE
+            avg_volt = sum(values) / count
+            min_volt = min(values)
+            max_volt = max(values)
+        try:
+            self.sock.sendmsg([memoryview(self._hdr_buf),
+                               memoryview(readings_buf)[:count * READING_SIZE]])
+        except ConnectionRefusedError:
+            pass  # no server listening; drop the batch, fire-and-forget
+
+        if self.verbose:
+            print(f"[VOLT CLIENT {self.device_id}] BATCH seq={self.seq}, {count} readings, "
+                  f"voltage avg={avg_volt:.2f}V (min={min_volt:.2f}, max={max_volt:.2f})")
         
         self.seq += 1
-        self.last_data_time = time.time()
-        self.batch_readings.clear()  # Clear batch after sending
+        self.last_data_time = time.monotonic()
+        # Swap in a fresh array rather than resizing in place: the numpy
+        # branch's zero-copy view still exports the old buffer, and
+        # resizing an exporting array raises BufferError
+        self.batch_values = array('f')
 
     def run(self, duration):
         print(f"[VOLT CLIENT {self.device_id}] Starting voltage sensor for {duration}s")
         self.send_init()
-        
-        start_time = time.time()
+        self._flush()  # INIT goes out immediately so the server sees us first
+
+        # All scheduling runs on the monotonic clock so wall-clock jumps
+        # (NTP steps, DST) cannot stall or burst the send timers
+        start_time = time.monotonic()
         end_time = start_time + duration
         self.last_data_time = start_time
         self.last_heartbeat_time = start_time
@@ -147,12 +378,17 @@ class VoltageClient:
             next_heartbeat_time = start_time + self.heartbeat_interval  # Schedule first potential heartbeat
             
             try:
-                while time.time() < end_time:
-                    current_time = time.time()
-                    
+                while True:
+                    current_time = time.monotonic()
+                    if current_time >= end_time:
+                        break
+                    # One wall-clock read per tick; every packet sent this
+                    # tick shares the same whole-second timestamp
+                    now_i = int(time.time())
+
                     # Priority 1: Send BATCH if it's time (highest priority)
                     if current_time >= next_batch_send_time:
-                        self.send_batch()  # Send whatever is in the batch (even if empty)
+                        self.send_batch(now_i)  # Send whatever is in the batch (even if empty)
                         next_batch_send_time = current_time + self.batching_interval  # Schedule next batch
                         # Reset heartbeat timing when batch is sent
                         next_heartbeat_time = current_time + self.heartbeat_interval
@@ -166,22 +402,29 @@ class VoltageClient:
                     elif (self.enable_heartbeat and 
                           current_time >= next_heartbeat_time and
                           (current_time - self.last_data_time) >= self.heartbeat_interval):
-                        self.send_heartbeat()
+                        self.send_heartbeat(now_i)
                         next_heartbeat_time = current_time + self.period_heartbeat  # Schedule next heartbeat
                     
-                    # Small sleep to prevent busy waiting
-                    time.sleep(0.1)
+                    # Flush whatever this tick queued, then sleep exactly
+                    # until the earliest upcoming deadline (no 100ms polling)
+                    self._flush()
+                    next_deadline = min(next_batch_send_time, next_reading_time, end_time)
+                    if self.enable_heartbeat:
+                        next_deadline = min(next_deadline, next_heartbeat_time)
+                    delay = next_deadline - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
                     
                 # Send any remaining readings in batch before exit
-                if self.batch_readings:
-                    print(f"[VOLT CLIENT {self.device_id}] Sending final batch with {len(self.batch_readings)} readings")
+                if self.batch_values:
+                    print(f"[VOLT CLIENT {self.device_id}] Sending final batch with {len(self.batch_values)} readings")
                     self.send_batch()
                     
             except KeyboardInterrupt:
                 print(f"\n[VOLT CLIENT {self.device_id}] Stopping...")
                 # Send any remaining readings in batch
-                if self.batch_readings:
-                    print(f"[VOLT CLIENT {self.device_id}] Sending final batch with {len(self.batch_readings)} readings")
+                if self.batch_values:
+                    print(f"[VOLT CLIENT {self.device_id}] Sending final batch with {len(self.batch_values)} readings")
                     self.send_batch()
         else:
             # NORMAL MODE (existing logic)
@@ -190,12 +433,17 @@ class VoltageClient:
             next_heartbeat_time = start_time + self.heartbeat_interval  # Schedule first potential heartbeat
             
             try:
-                while time.time() < end_time:
-                    current_time = time.time()
-                    
+                while True:
+                    current_time = time.monotonic()
+                    if current_time >= end_time:
+                        break
+                    # One wall-clock read per tick; every packet sent this
+                    # tick shares the same whole-second timestamp
+                    now_i = int(time.time())
+
                     # Priority 1: Send DATA if it's time (DATA has highest priority)
                     if current_time >= next_data_time:
-                        self.send_voltage_data()
+                        self.send_voltage_data(now_i)
                         next_data_time = current_time + self.interval  # Schedule next data
                         # Reset heartbeat timing when data is sent
                         next_heartbeat_time = current_time + self.heartbeat_interval
@@ -204,15 +452,23 @@ class VoltageClient:
                     elif (self.enable_heartbeat and 
                           current_time >= next_heartbeat_time and
                           (current_time - self.last_data_time) >= self.heartbeat_interval):
-                        self.send_heartbeat()
+                        self.send_heartbeat(now_i)
                         next_heartbeat_time = current_time + self.period_heartbeat  # Schedule next heartbeat
                     
-                    # Small sleep to prevent busy waiting
-                    time.sleep(0.1)
+                    # Flush whatever this tick queued, then sleep exactly
+                    # until the earliest upcoming deadline (no 100ms polling)
+                    self._flush()
+                    next_deadline = min(next_data_time, end_time)
+                    if self.enable_heartbeat:
+                        next_deadline = min(next_deadline, next_heartbeat_time)
+                    delay = next_deadline - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
                     
             except KeyboardInterrupt:
                 print(f"\n[VOLT CLIENT {self.device_id}] Stopping...")
         
+        self._flush()  # Drain anything queued by a final batch or interrupt
         self.sock.close()
         print(f"[VOLT CLIENT {self.device_id}] Socket closed")
 
@@ -229,9 +485,11 @@ if __name__ == "__main__":
     parser.add_argument("--enable-heartbeat", action="store_true", help="Enable heartbeat functionality")
     parser.add_argument("--enable-batching", action="store_true", help="Enable batching mode (collect multiple readings per packet)")
     parser.add_argument("--batching-interval", type=float, default=10.0, help="Interval between batch sends (default: 10.0s)")
+    parser.add_argument("--verbose", action="store_true", help="Print per-packet events (DATA/HEARTBEAT/BATCH)")
+    parser.add_argument("--mtu", type=int, help="Link MTU to size batches against (protocol payload limit still applies)")
     args = parser.parse_args()
 
     client = VoltageClient(args.device_id, args.server_host, args.server_port, args.interval, args.seed,
                           args.heartbeat_interval, args.enable_heartbeat, args.period_heartbeat,
-                          args.enable_batching, args.batching_interval)
+                          args.enable_batching, args.batching_interval, args.verbose, args.mtu)
     client.run(args.duration)
\ No newline at end of file